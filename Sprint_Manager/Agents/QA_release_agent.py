@@ -1,54 +1,77 @@
 # Sprint_Manager/Agents/QA_release_agent.py
-import requests
 import os
 from datetime import datetime
 from .base_agent import BaseAgent
+from ..Services.jira_service import JiraService
 from ..Services.llm_service import LLMService # <-- NEW IMPORT
+from ..config import get_setting
 
 class QAReleaseAgent(BaseAgent):
-    def __init__(self, jira_domain, jira_email, api_token):
+    def __init__(self, jira_domain, jira_email, api_token, snapshot=None, llm_service=None, flow_analytics=None):
         super().__init__(jira_domain, jira_email, api_token)
-        self.llm_service = LLMService() # <-- Initialize LLM
+        self.snapshot = snapshot # Shared per-run issue snapshot (optional)
+        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain, client=self.jira_client)
+        self.llm_service = llm_service or LLMService() # <-- Initialize LLM (shared in daemon mode)
+        self.flow_analytics = flow_analytics # Changelog-based cycle time / bottleneck analytics (optional)
+        # Release-note chunks categorized in parallel
+        self.concurrency = max(1, get_setting('qa_release', 'concurrency', 4))
+
+    # Release-note sections in output order (Internal work is left out of the notes)
+    RELEASE_SECTIONS = [("Feature", "🚀 New Features"), ("Bug Fix", "🐛 Bug Fixes"), ("Improvement", "🔧 Improvements")]
+
+    def _fallback_entry(self, issue):
+        """Used when the LLM could not categorize a ticket: its Jira type decides, its summary is the note."""
+        issue_type = (issue['fields'].get('issuetype') or {}).get('name')
+        return {"category": "Bug Fix" if issue_type == "Bug" else "Improvement", "note": issue['fields']['summary']}
+
+    def _render_release_notes(self, entries, release_date):
+        """Merges categorized tickets into Markdown: fixed section order, tickets in key order within a section."""
+        lines = [f"## Release Notes — {release_date}", ""]
+        counts = {category: 0 for category, _ in self.RELEASE_SECTIONS}
+        for category, heading in self.RELEASE_SECTIONS:
+            keys = sorted((k for k, e in entries.items() if e["category"] == category), key=self._issue_sort_key)
+            if not keys:
+                continue
+            counts[category] = len(keys)
+            lines.append(f"### {heading}")
+            lines.append("")
+            lines.extend(f"*   **{key}:** {entries[key]['note']}" for key in keys)
+            lines.append("")
+        summary = ", ".join(f"{count} {heading.split(' ', 1)[1].lower()}" for (category, heading), count
+                            in zip(self.RELEASE_SECTIONS, counts.values()) if count)
+        lines.insert(2, f"This release includes {summary}.\n" if summary else "No user-facing changes in this release.\n")
+        return "\n".join(lines).rstrip() + "\n"
 
     def _generate_release_notes(self, done_issues):
-        """Uses LLM to write professional release notes from completed tickets."""
+        """
+        Writes RELEASE_NOTES.md from completed tickets: tickets are categorized by the LLM in
+        token-budgeted chunks (concurrently, cached per ticket), then merged without the LLM.
+        """
         if not done_issues:
             return "No completed issues to document."
 
         print(f"  [QA] Generating Release Notes for {len(done_issues)} items...")
-        
-        # Prepare data for LLM
-        issue_summaries = [f"- {i['key']}: {i['fields']['summary']}" for i in done_issues]
-        issue_text = "\n".join(issue_summaries)
-        
-        prompt = f"""
-        You are a Technical Writer for a software team. 
-        Take the following list of completed JIRA tickets and write a clean, professional Release Note in Markdown format.
-        
-        Categorize the items into:
-        - 🚀 New Features
-        - 🐛 Bug Fixes
-        - 🔧 Improvements
-        
-        Ignore internal tasks if they don't look user-facing.
-        Add a catchy title with today's date ({datetime.now().strftime('%Y-%m-%d')}).
+        tickets = [{"key": i['key'], "summary": i['fields']['summary'],
+                    "issue_type": (i['fields'].get('issuetype') or {}).get('name')} for i in done_issues]
 
-        Tickets:
-        {issue_text}
-
-        Output only the Markdown content.
-        """
-        
         try:
-            notes_content = self.llm_service.model.generate_content(prompt).text
-            
+            categorized = self.llm_service.categorize_release_batch(tickets, max_workers=self.concurrency)
+            entries = {i['key']: categorized.get(i['key']) or self._fallback_entry(i) for i in done_issues}
+            notes_content = self._render_release_notes(entries, datetime.now().strftime('%Y-%m-%d'))
+
             # Save to file
             filename = "RELEASE_NOTES.md"
             with open(filename, "w", encoding="utf-8") as f:
                 f.write(notes_content)
-                
+
             print(f"  [QA] ✅ Successfully wrote {filename}")
-            return f"✅ **RELEASE_NOTES.md** generated with {len(done_issues)} items."
+            internal = sum(1 for e in entries.values() if e["category"] == "Internal")
+            uncategorized = len(done_issues) - len(categorized)
+            details = [f"{internal} internal omitted"] if internal else []
+            if uncategorized:
+                details.append(f"{uncategorized} categorized by issue type after LLM failures")
+            suffix = f" ({'; '.join(details)})" if details else ""
+            return f"✅ **RELEASE_NOTES.md** generated with {len(done_issues)} items{suffix}."
         except Exception as e:
             print(f"  [QA] Error generating notes: {e}")
             return f"❌ Failed to generate release notes: {e}"
@@ -60,7 +83,6 @@ class QAReleaseAgent(BaseAgent):
 
         # 1. Existing Logic: Check "In Review" (The bottleneck check)
         print("Perceiving tickets in QA/Review...")
-        search_url = f"{self.jira_domain}/rest/api/3/search/jql"
         
         # We perform two searches: one for Review (Monitoring), one for Done (Documentation)
         jql_review = 'status = "In Review"'
@@ -68,20 +90,29 @@ class QAReleaseAgent(BaseAgent):
         
         try:
             # A. Check "In Review"
-            response = requests.post(search_url, headers=self.headers, json={"jql": jql_review, "fields": ["key", "summary"]}, auth=self.auth)
-            response.raise_for_status()
-            review_issues = response.json().get('issues', [])
+            if self.snapshot:
+                review_issues = self.snapshot.in_review_issues()
+            else:
+                review_issues = self.jira_service.search_issues(jql_review, ["key", "summary"])
+            review_lines = [f"- {issue['key']}: {issue['fields']['summary']}" for issue in review_issues]
             
-            if review_issues:
-                report_lines.append(f"**⚠️ QA Bottleneck Alert**: {len(review_issues)} tickets waiting in review:")
-                for issue in review_issues:
-                    report_lines.append(f"- {issue['key']}: {issue['fields']['summary']}")
+            if review_lines:
+                report_lines.append(f"**⚠️ QA Bottleneck Alert**: {len(review_lines)} tickets waiting in review:")
+                report_lines.extend(review_lines)
             else:
                 report_lines.append("✅ No tickets currently stalled in Review.")
 
+            # Where work actually waits, from status changelogs
+            if self.flow_analytics:
+                self.flow_analytics.refresh()
+                report_lines.append("\n**📈 Flow Analytics** (board, last {} days)".format(get_setting('flow', 'window_days', 14)))
+                report_lines.extend(self.flow_analytics.format_summary(self.flow_analytics.metrics()))
+
             # B. Generate Release Notes (The New Feature)
-            response_done = requests.post(search_url, headers=self.headers, json={"jql": jql_done, "fields": ["key", "summary"]}, auth=self.auth)
-            done_issues = response_done.json().get('issues', [])
+            if self.snapshot:
+                done_issues = self.snapshot.recently_done_issues(days=7)
+            else:
+                done_issues = list(self.jira_service.search_issues(jql_done, ["key", "summary", "issuetype"]))
             
             if done_issues:
                 # Trigger the autonomous writing process
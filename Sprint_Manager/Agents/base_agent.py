@@ -1,12 +1,32 @@
+from ..Services.jira_client import JiraClient
+from ..Services.jira_service import parse_jira_datetime
+
 class BaseAgent:
-    def __init__(self, jira_domain, jira_email, api_token):
+    def __init__(self, jira_domain, jira_email, api_token, jira_client=None):
         self.jira_domain = jira_domain
         self.jira_email = jira_email
         self.api_token = api_token
         self.auth = (self.jira_email, self.api_token)
         self.headers = {"Accept": "application/json"}
+        # One pooled client shared by every agent (and their JiraService) for this account
+        self.jira_client = jira_client or JiraClient.shared(jira_domain, jira_email, api_token)
         print(f"{self.__class__.__name__} initialized.")
 
+    def _latest_updated(self, issues, current=None):
+        """Returns the newest 'updated' timestamp among issues (and current), for advancing a watermark."""
+        latest, latest_dt = current, parse_jira_datetime(current)
+        for issue in issues:
+            updated = issue['fields'].get('updated')
+            updated_dt = parse_jira_datetime(updated)
+            if updated_dt and (latest_dt is None or updated_dt > latest_dt):
+                latest, latest_dt = updated, updated_dt
+        return latest
+
+    def _issue_sort_key(self, issue_key):
+        """Orders 'PROJ-9' before 'PROJ-10'."""
+        project, _, number = issue_key.rpartition('-')
+        return (project, int(number) if number.isdigit() else 0)
+
     def execute(self):
         """A placeholder for the agent's main loop."""
-        raise NotImplementedError("Each agent must implement the execute method.")
\ No newline at end of file
+        raise NotImplementedError("Each agent must implement the execute method.")
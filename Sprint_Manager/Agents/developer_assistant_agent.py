@@ -1,28 +1,180 @@
 # Sprint_Manager/Agents/developer_assistant_agent.py
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from .base_agent import BaseAgent
 from ..Services.jira_service import JiraService
 from ..Services.llm_service import LLMService
+from ..Services.jira_write_queue import JiraWriteQueue
 from ..Services.git_service import GitService
+from ..config import get_setting
+from ..message_broker import TOPIC_DEVELOPER_ALERTS
+from ..adf import get_shared_text_cache
 
 class DeveloperAssistantAgent(BaseAgent):
-    def __init__(self, jira_domain, jira_email, api_token, message_broker):
+    AGENT_NAME = "DeveloperAssistantAgent"
+    NUDGE_ACTION = "no_code_activity_nudge"
+
+    def __init__(self, jira_domain, jira_email, api_token, message_broker, snapshot=None, kb=None, llm_service=None, write_queue=None):
         super().__init__(jira_domain, jira_email, api_token)
-        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain)
-        self.llm_service = LLMService()
+        self.kb = kb # Stores the watermark and previous analyses for incremental runs (optional)
+        self.snapshot = snapshot # Shared per-run issue snapshot (optional)
+        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain, client=self.jira_client)
+        self.llm_service = llm_service or LLMService()
+        self.write_queue = write_queue or JiraWriteQueue(self.jira_service)
+        self._writes = None # The current run's WriteBatch
         self.git_service = GitService()
         self.message_broker = message_broker
         self.analyzed_issues_count = 0
+        # Max issues analyzed in parallel (1 = sequential)
+        self.concurrency = max(1, get_setting('developer_assistant', 'concurrency', 8))
+        self._previous_results = {}
+        # Nudges already posted within this window are not repeated
+        self.cooldown_hours = get_setting('action_ledger', 'cooldown_hours', 24)
+
+    def _get_text_from_comment_body(self, body, comment_id=None, updated=None):
+        """Plain text of an ADF comment body, capped at the LLM prompt budget and cached per comment version."""
+        return get_shared_text_cache().text(comment_id, updated if comment_id else None, body,
+                                            max_chars=get_setting('llm', 'max_comment_chars', 2000))
+
+    def _process_issue(self, issue):
+        """
+        Runs the git check and comment fetch for one issue.
+        Safe to call from worker threads: it only returns a result dict with the report
+        lines, broker messages and (if any) the comment text still awaiting LLM analysis.
+        """
+        issue_key, summary = issue['key'], issue['fields']['summary']
+        result = {"key": issue_key, "summary": summary, "updated": issue['fields'].get('updated'),
+                  "lines": [], "messages": [], "comment_text": None, "nudge": None, "reusable": True}
+
+        # 1. Code-Ticket Link Monitoring
+        if not self.git_service.check_recent_activity(issue_key, lookback_days=2):
+            comment_body = (
+                f"🤖 **JIRA AutoPilot (Code Monitor)** 🤖\n\n"
+                f"I noticed this ticket ({issue_key}) has been in 'In Progress' for over 48 hours without recent code commits.\n"
+                f"Please provide a quick status update."
+            )
+            if self.kb and self.kb.was_action_taken(issue_key, self.NUDGE_ACTION, comment_body, self.cooldown_hours):
+                result["lines"].append(f"- **{issue_key}**: **No recent code activity**. Already nudged within the last {self.cooldown_hours}h.")
+            else:
+                self._writes.add_comment(issue_key, comment_body)
+                result["nudge"] = comment_body
+                result["lines"].append(f"- **{issue_key}**: **No recent code activity**. AutoPilot added a comment.")
+            result["messages"].append(self._alert(
+                "NO_CODE_ACTIVITY", issue_key, summary,
+                f"NO_CODE_ACTIVITY: Issue {issue_key} ({summary}) has no recent code activity. Status: In Progress."
+            ))
+            result["reusable"] = False
+            return result
+
+        # 2. Reuse the previous comment analysis if the issue has not changed since
+        previous = self._previous_results.get(issue_key)
+        if previous and previous["result"]["lines"] is not None and previous["updated"] == result["updated"]:
+            print(f"  -> {issue_key}: Unchanged since last run, reusing previous analysis.")
+            result["lines"] = list(previous["result"]["lines"])
+            result["messages"] = list(previous["result"]["messages"])
+            return result
+
+        # 3. Latest comment (analyzed later in one batched LLM call)
+        print(f"\nAnalyzing ticket: {issue_key} - {summary}")
+
+        comments = self.jira_service.get_comments_for_issue(issue_key)
+        if not comments:
+            print(f"  -> {issue_key}: No comments found.")
+            result["lines"].append(f"- {issue_key}: No comments found.")
+            return result
+
+        latest = comments[-1]
+        comment_text = self._get_text_from_comment_body(latest['body'], latest.get('id'), latest.get('updated'))
+        
+        # --- FINAL FIX: Ignore AutoPilot's own comments ---
+        if "JIRA AutoPilot" in comment_text or "NO_CODE_ACTIVITY" in comment_text:
+            print(f"  -> {issue_key}: Skipping analysis (Comment is from AutoPilot).")
+            result["lines"].append(f"- {issue_key}: Skipped (Last comment was automated).")
+            return result
+        # --------------------------------------------------
+
+        if not comment_text.strip():
+            print(f"  -> {issue_key}: Latest comment has no text content.")
+            return result
+        
+        print(f"  -> {issue_key} Latest Comment: \"{comment_text}\"")
+        result["comment_text"] = comment_text
+        return result
+
+    def _alert(self, alert_type, issue_key, summary, content, analysis=None):
+        """Builds a (content, payload) broker message; the payload carries the structured fields."""
+        payload = {"type": alert_type, "issue_key": issue_key, "summary": summary, "analysis": analysis}
+        return [content, payload]
+
+    def _apply_analysis(self, result, analysis):
+        """Adds the structured LLM verdict for one issue to its report lines and broker messages."""
+        issue_key, summary = result["key"], result["summary"]
+        if analysis is None:
+            result["reusable"] = False # Retry the analysis next run
+            result["lines"].append(f"- **{issue_key}**: {summary}\n  - **LLM Analysis**: Unavailable (analysis failed).")
+            return
+
+        blocked_label = "Yes" if analysis["blocked"] else "No"
+        verdict = f"Sentiment: {analysis['sentiment']}, Blocked: {blocked_label} (confidence {analysis['confidence']:.2f})"
+        print(f"  -> 🤖 {issue_key} LLM Analysis: {verdict}")
+        result["lines"].append(f"- **{issue_key}**: {summary}\n  - **LLM Analysis**: {verdict}")
+
+        if analysis["blocked"] or analysis["sentiment"] == "Negative":
+            result["messages"].append(self._alert(
+                "BLOCKER_DETECTED", issue_key, summary,
+                f"BLOCKER_DETECTED: Issue {issue_key} ({summary}) has negative sentiment/blocker: {verdict}",
+                analysis=analysis
+            ))
 
-    def _get_text_from_comment_body(self, body):
-        full_text = []
-        if 'content' in body and isinstance(body['content'], list):
-            for block in body['content']:
-                if 'content' in block and isinstance(block['content'], list):
-                    for element in block['content']:
-                        if element.get('type') == 'text' and 'text' in element:
-                            full_text.append(element['text'])
-        return " ".join(full_text)
+    def _fetch_incremental(self, watermark):
+        """
+        Rebuilds the "my In Progress issues" list from the previous run's issues plus only
+        the issues changed since the watermark. Changed issues that left In Progress (or
+        were reassigned away) are dropped; untouched ones keep their saved summary/updated.
+        """
+        updated_since = self.jira_service.updated_since_clause(watermark)
+        my_account_id = self.jira_service.get_current_user().get('accountId')
+        issues = {
+            key: {"key": key, "fields": {"summary": previous["result"]["summary"], "updated": previous["updated"]}}
+            for key, previous in self._previous_results.items()
+        }
+        changed_jql = f'(assignee = currentUser() OR assignee WAS currentUser()) AND {updated_since}'
+        changed_count = 0
+        for issue in self.jira_service.search_issues(changed_jql, ["summary", "status", "assignee", "updated"]):
+            changed_count += 1
+            status = (issue['fields'].get('status') or {}).get('name')
+            assignee = (issue['fields'].get('assignee') or {}).get('accountId')
+            if status == "In Progress" and assignee == my_account_id:
+                issues[issue['key']] = issue
+            else:
+                issues.pop(issue['key'], None)
+        print(f"  [Incremental] {changed_count} issue(s) changed ({updated_since}).")
+        return sorted(issues.values(), key=lambda i: self._issue_sort_key(i['key']))
+
+    def _needs_full_resync(self):
+        """A full query is forced periodically so the incremental view cannot drift for long."""
+        last_full = self.kb.get_watermark(f"{self.AGENT_NAME}:full_sync")
+        if not last_full:
+            return True
+        hours = get_setting('incremental', 'full_resync_hours', 24)
+        return datetime.now() - datetime.fromisoformat(last_full) > timedelta(hours=hours)
+
+    def _save_run_state(self, issues, results, watermark, full_sync):
+        """Persists per-issue comment analyses and advances the watermark."""
+        # lines/messages are None for nudged or failed issues: there is no comment analysis to reuse
+        self.kb.replace_agent_results(self.AGENT_NAME, {
+            result["key"]: (result["updated"], {
+                "summary": result["summary"],
+                "lines": result["lines"] if result["reusable"] else None,
+                "messages": result["messages"] if result["reusable"] else None,
+            })
+            for result in results
+        })
+        new_watermark = self._latest_updated(issues, watermark)
+        if new_watermark:
+            self.kb.set_watermark(self.AGENT_NAME, new_watermark)
+        if full_sync:
+            self.kb.set_watermark(f"{self.AGENT_NAME}:full_sync", datetime.now().isoformat())
 
     def execute(self):
         """Analyzes assigned tickets, checks for code activity, and returns a string report."""
@@ -30,70 +182,69 @@ class DeveloperAssistantAgent(BaseAgent):
         print("Perceiving assigned tasks...")
         
         report_lines = []
-        search_url = f"{self.jira_domain}/rest/api/3/search/jql"
-        data = { "jql": 'assignee = currentUser() AND status = "In Progress"', "fields": ["key", "summary"] } 
+        jql = 'assignee = currentUser() AND status = "In Progress"'
 
         try:
-            response = requests.post(search_url, headers=self.headers, json=data, auth=self.auth)
-            response.raise_for_status()
-            issues = response.json().get('issues', [])
+            # Incremental state: the watermark plus each issue's analysis from the last run
+            self._previous_results = self.kb.get_agent_results(self.AGENT_NAME) if self.kb else {}
+            watermark = self.kb.get_watermark(self.AGENT_NAME) if self.kb else None
+            full_sync = True
+
+            # A loaded snapshot is free to read; a cold one would download the whole board, so the
+            # incremental query is preferred then (e.g. a one-shot run that has a watermark)
+            if self.snapshot and (self.snapshot.is_loaded() or not watermark or self._needs_full_resync()):
+                issues = self.snapshot.my_in_progress_issues()
+            elif watermark and not self._needs_full_resync():
+                issues = self._fetch_incremental(watermark)
+                full_sync = False
+            else:
+                issues = list(self.jira_service.search_issues(jql, ["key", "summary", "updated"]))
+
             self.analyzed_issues_count = len(issues)
             print(f"Found {self.analyzed_issues_count} assigned issues in 'In Progress'.")
             report_lines.append(f"Found {self.analyzed_issues_count} assigned issues in 'In Progress':")
 
-            for issue in issues:
-                issue_key, summary = issue['key'], issue['fields']['summary']
-                
-                # 1. Code-Ticket Link Monitoring
-                if not self.git_service.check_recent_activity(issue_key, lookback_days=2):
-                    comment_body = (
-                        f"🤖 **JIRA AutoPilot (Code Monitor)** 🤖\n\n"
-                        f"I noticed this ticket ({issue_key}) has been in 'In Progress' for over 48 hours without recent code commits.\n"
-                        f"Please provide a quick status update."
-                    )
-                    self.jira_service.add_comment(issue_key, comment_body)
-                    report_lines.append(f"- **{issue_key}**: **No recent code activity**. AutoPilot added a comment.")
-                    
-                    self.message_broker.publish(
-                        "DeveloperAssistantAgent", 
-                        f"NO_CODE_ACTIVITY: Issue {issue_key} ({summary}) has no recent code activity. Status: In Progress."
-                    )
-                    continue 
-
-                # 2. LLM Analysis
-                print(f"\nAnalyzing ticket: {issue_key} - {summary}")
-
-                comments = self.jira_service.get_comments_for_issue(issue_key)
-                if not comments:
-                    print("  -> No comments found.")
-                    report_lines.append(f"- {issue_key}: No comments found.")
-                    continue
-
-                comment_text = self._get_text_from_comment_body(comments[-1]['body'])
-                
-                # --- FINAL FIX: Ignore AutoPilot's own comments ---
-                if "JIRA AutoPilot" in comment_text or "NO_CODE_ACTIVITY" in comment_text:
-                    print("  -> Skipping analysis (Comment is from AutoPilot).")
-                    report_lines.append(f"- {issue_key}: Skipped (Last comment was automated).")
-                    continue
-                # --------------------------------------------------
-
-                if not comment_text.strip():
-                    print("  -> Latest comment has no text content.")
-                    continue
-                
-                print(f"  -> Latest Comment: \"{comment_text}\"")
-                analysis = self.llm_service.analyze_comment(comment_text)
-                print(f"  -> 🤖 LLM Analysis: {analysis}")
-                report_lines.append(f"- **{issue_key}**: {summary}\n  - **LLM Analysis**: {analysis}")
-                
-                is_blocked = "blocked: yes" in analysis.lower()
-                is_negative = "sentiment: negative" in analysis.lower()
-                
-                if is_blocked or is_negative:
-                    message = f"BLOCKER_DETECTED: Issue {issue_key} ({summary}) has negative sentiment/blocker: {analysis}"
-                    self.message_broker.publish("DeveloperAssistantAgent", message)
-                    report_lines.append("  - 📢 **Published Blocked Message to Broker**")
+            # Nudge comments are queued by the workers and sent in one flush below
+            self._writes = self.write_queue.batch()
+
+            # Issues are gathered in parallel; map() hands results back in input order,
+            # so the report stays deterministic and broker messages are published from this thread.
+            if self.concurrency > 1 and len(issues) > 1:
+                with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                    results = list(executor.map(self._process_issue, issues))
+            else:
+                results = [self._process_issue(issue) for issue in issues]
+
+            write_results = self._writes.flush()
+            nudged = []
+            for result in results:
+                if write_results.get(result["key"], {}).get("comment") is False:
+                    result["lines"].append(f"  - ⚠️ Could not post the AutoPilot comment to {result['key']}.")
+                elif result["nudge"]:
+                    nudged.append((result["key"], self.NUDGE_ACTION, result["nudge"]))
+            if self.kb and nudged:
+                self.kb.record_actions(nudged)
+
+            # One batched LLM pass scores every pending comment
+            to_analyze = [{"key": r["key"], "text": r["comment_text"]} for r in results if r["comment_text"]]
+            analyses = self.llm_service.analyze_comments_batch(to_analyze, max_workers=self.concurrency) if to_analyze else {}
+
+            alerts = []
+            for result in results:
+                if result["comment_text"]:
+                    self._apply_analysis(result, analyses.get(result["key"]))
+                report_lines.extend(result["lines"])
+                for content, payload in result["messages"]:
+                    alerts.append((content, payload))
+                    if payload["type"] == "BLOCKER_DETECTED":
+                        report_lines.append("  - 📢 **Published Blocked Message to Broker**")
+
+            # All alerts go out in one batched publish, in report order
+            if alerts:
+                self.message_broker.publish_batch(self.AGENT_NAME, alerts, topic=TOPIC_DEVELOPER_ALERTS)
+
+            if self.kb:
+                self._save_run_state(issues, results, watermark, full_sync)
                 
         except Exception as e:
             print(f"An error occurred: {e}")
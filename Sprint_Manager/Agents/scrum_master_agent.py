@@ -1,40 +1,81 @@
 # Sprint_Manager/Agents/scrum_master_agent.py
 import requests
-import re
-from datetime import datetime, date
+from datetime import datetime
 from .base_agent import BaseAgent
 from ..Services.jira_service import JiraService
+from ..Services.jira_write_queue import JiraWriteQueue
+from ..message_broker import TOPIC_DEVELOPER_ALERTS
+from ..config import get_setting
+from ..forecaster import SprintForecaster
+
+def _is_done(status):
+    """Whether a Jira status is in the Done category (workflows name their final status freely)."""
+    return (status.get('statusCategory') or {}).get('key') == 'done'
 
 class ScrumMasterAgent(BaseAgent):
-    def __init__(self, jira_domain, jira_email, api_token, sprint_id, kb, message_broker):
+    CONSUMER_NAME = "ScrumMasterAgent"
+    ESCALATION_ACTION = "blocker_escalation"
+
+    def __init__(self, jira_domain, jira_email, api_token, sprint_id, kb, message_broker, snapshot=None, write_queue=None, flow_analytics=None):
         super().__init__(jira_domain, jira_email, api_token)
+        self.snapshot = snapshot # Shared per-run issue snapshot (optional)
         self.sprint_id = sprint_id
         self.kb = kb
         self.message_broker = message_broker
-        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain) # For autonomous action
+        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain, client=self.jira_client) # For autonomous action
+        self.write_queue = write_queue or JiraWriteQueue(self.jira_service)
+        # Escalations already posted within this window are not repeated
+        self.cooldown_hours = get_setting('action_ledger', 'cooldown_hours', 24)
+        self.forecaster = SprintForecaster()
+        self.flow_analytics = flow_analytics # Changelog-based cycle time / bottleneck analytics (optional)
+        self.story_points_field = get_setting('jira', 'story_points_field', 'customfield_10016')
 
-    def _record_sprint_health(self, sprint_issues):
+    def _record_sprint_health(self, sprint_issues, start_date=None):
         """Records the number of completed issues into the Knowledge Base."""
-        done_issues = sum(1 for issue in sprint_issues if issue['fields']['status']['name'].lower() == 'done')
+        done_issues = sum(1 for issue in sprint_issues if _is_done(issue['fields']['status']))
         try:
-            cursor = self.kb.conn.cursor()
-            today = date.today().isoformat()
             # Note: We are not calculating team_velocity here, but storing completed_points for later calculation.
-            cursor.execute('INSERT OR REPLACE INTO sprint_history (sprint_id, end_date, completed_points) VALUES (?, ?, ?)',
-                           (self.sprint_id, today, done_issues))
-            self.kb.conn.commit()
+            self.kb.record_sprint_health(self.sprint_id, done_issues, start_date=start_date)
             print(f"  [DB] Knowledge Base updated for Sprint {self.sprint_id}. Completed issues: {done_issues}")
+            self._record_daily_snapshot(sprint_issues)
             return done_issues
         except Exception as e:
             print(f"  [DB] Error updating Knowledge Base: {e}")
             return 0
 
-    def _handle_blocker_message(self, message):
-        """Processes a blocker/no-code message and takes autonomous action (commenting)."""
-        match = re.search(r'Issue ([\w-]+)', message['content'])
-        if not match:
-            return f"Error: Could not parse issue key from message."
-        issue_key = match.group(1)
+    def _record_daily_snapshot(self, sprint_issues):
+        """Stores today's per-status issue counts and story points in the sprint time series."""
+        by_status = {}
+        for issue in sprint_issues:
+            status = issue['fields']['status']
+            entry = by_status.setdefault(status['name'], [_is_done(status), 0, 0])
+            entry[1] += 1
+            points = issue['fields'].get(self.story_points_field)
+            if isinstance(points, (int, float)):
+                entry[2] += points
+        try:
+            self.kb.record_daily_snapshot(self.sprint_id, [(name, *values) for name, values in by_status.items()])
+        except Exception as e:
+            print(f"  [DB] Error recording daily snapshot: {e}")
+
+    def _escalation_fingerprint(self, payload):
+        """What an escalation is about: the alert type plus the verdict (not its wording or confidence)."""
+        analysis = payload.get('analysis') or {}
+        return f"{payload.get('type')}|{analysis.get('sentiment')}|{analysis.get('blocked')}"
+
+    def _handle_blocker_message(self, message, writes):
+        """
+        Processes a blocker/no-code message and queues autonomous action (commenting).
+        Returns (issue_key, fingerprint); fingerprint is None when the ledger says it was already escalated.
+        """
+        payload = message.get('payload') or {}
+        issue_key = payload.get('issue_key')
+        if not issue_key:
+            return None, None
+
+        fingerprint = self._escalation_fingerprint(payload)
+        if self.kb.was_action_taken(issue_key, self.ESCALATION_ACTION, fingerprint, self.cooldown_hours):
+            return issue_key, None
         
         comment_body = (
             f"🚨 **JIRA AutoPilot Alert ({message['sender']})** 🚨\n\n"
@@ -43,17 +84,38 @@ class ScrumMasterAgent(BaseAgent):
             f"Escalating for immediate review and action."
         )
         
-        # Autonomous Action: Add a high-priority comment
-        if self.jira_service.add_comment(issue_key, comment_body):
-            # Optional: Add code here to update status to "Blocked" if your JIRA instance has it.
-            return f"✅ AutoPilot Action: Added escalation comment to **{issue_key}**."
-        else:
-            return f"❌ AutoPilot Action Failed: Could not add comment to {issue_key}."
+        # Autonomous Action: Add a high-priority comment.
+        # The Developer Assistant already nudged stalled tickets itself, so that escalation is dropped if it just did.
+        writes.add_comment(issue_key, comment_body, skip_if_recent=payload.get('type') == 'NO_CODE_ACTIVITY')
+        # Optional: Add code here to update status to "Blocked" if your JIRA instance has it.
+        return issue_key, fingerprint
+
+    def _summarize_blocker_actions(self, escalations, write_results):
+        """One report line per escalated issue, from the outcome of the flushed writes. Records escalations in the ledger."""
+        actions, performed = [], []
+        for issue_key, fingerprint in dict.fromkeys(escalations):
+            if issue_key is None:
+                actions.append("Error: Message is missing an issue key.")
+                continue
+            if fingerprint is None:
+                actions.append(f"ℹ️ AutoPilot Action: **{issue_key}** was already escalated within the last {self.cooldown_hours}h; skipped.")
+                continue
+            result = write_results.get(issue_key, {})
+            if result.get("comment"):
+                performed.append((issue_key, self.ESCALATION_ACTION, fingerprint))
+                actions.append(f"✅ AutoPilot Action: Added escalation comment to **{issue_key}**.")
+            elif result.get("comment") is None and result.get("skipped_comments"):
+                actions.append(f"ℹ️ AutoPilot Action: **{issue_key}** already has a recent AutoPilot comment; escalation skipped.")
+            else:
+                actions.append(f"❌ AutoPilot Action Failed: Could not add comment to {issue_key}.")
+        if performed:
+            self.kb.record_actions(performed)
+        return actions
 
 
     # --- DATA-DRIVEN INTELLIGENCE: Velocity Risk & Scope Creep ---
     def _analyze_sprint_risk(self, completed_count, sprint_details, sprint_issues):
-        """Predicts risk based on velocity AND detects Scope Creep."""
+        """Forecasts completion (Monte Carlo) AND detects Scope Creep."""
         report = []
         
         # Parse Sprint Dates
@@ -89,29 +151,53 @@ class ScrumMasterAgent(BaseAgent):
             report.append(f"**{len(scope_creep_issues)} tickets** were added after the sprint started!")
             report.append(f"Impacted Tickets: {', '.join(scope_creep_issues)}")
 
-        # 2. Velocity Risk Calculation
-        total_duration = (end_date - start_date).total_seconds()
-        elapsed_duration = (now - start_date).total_seconds()
-        if elapsed_duration < 0: elapsed_duration = 0
-        progress_pct = elapsed_duration / total_duration if total_duration > 0 else 1.0
-        
-        avg_velocity = self.kb.get_average_velocity()
-        expected_completion = avg_velocity * progress_pct
-        
-        report.append(f"\n**📊 Velocity Analysis** (Historical Avg: {avg_velocity:.1f})")
-        
-        if progress_pct > 0.0:
-            if completed_count < (expected_completion * 0.7):
-                report.append("🔴 **RISK LEVEL: HIGH**. Team is significantly behind pace.")
-            elif completed_count < (expected_completion * 0.9):
-                report.append("🟡 **RISK LEVEL: MEDIUM**. Team is slightly behind pace.")
-            else:
-                report.append("🟢 **RISK LEVEL: LOW**. Sprint is on track.")
-        else:
-            report.append("--- Risk analysis will begin once sprint progress is measurable. ---")
-            
+        # 2. Monte Carlo Completion Forecast
+        report.extend(self._forecast_completion(completed_count, start_date, end_date, now, sprint_issues))
         return report
 
+    def _forecast_completion(self, completed_count, start_date, end_date, now, sprint_issues):
+        """P50/P85/P95 finish dates and on-time probability from simulated historical throughput."""
+        remaining = len(sprint_issues) - completed_count
+        days_left = max((end_date - now).total_seconds() / 86400, 0.0)
+        history_sprints = get_setting('forecast', 'history_sprints', 10)
+        # Day-by-day throughput from the sprint time series; per-sprint averages until there is enough of it
+        samples = self.kb.get_daily_throughput(last_n_sprints=history_sprints)
+        if len(samples) < get_setting('forecast', 'min_daily_samples', 5):
+            history = self.kb.get_sprint_history(last_n=history_sprints)
+            samples = SprintForecaster.daily_rates_from_history([(start, as_of, done) for _, start, as_of, done in history])
+        # Without history yet, the current sprint's own pace is the only evidence
+        elapsed_days = (now - start_date).total_seconds() / 86400
+        if not samples and elapsed_days >= 1 and completed_count:
+            samples = [completed_count / elapsed_days]
+
+        result = self.forecaster.forecast(remaining, samples, days_left, today=now)
+        report = [f"\n**🎲 Completion Forecast** ({len(samples)} throughput sample(s), {remaining} issues remaining, {days_left:.1f} days left)"]
+        if result is None:
+            report.append("--- Forecast will begin once completed work gives a measurable throughput. ---")
+            return report
+        if not result["percentiles"]:
+            report.append("🟢 All sprint issues are done.")
+            return report
+
+        probability = result["probability_on_time"]
+        marker = "🟢" if probability >= 0.85 else "🟡" if probability >= 0.5 else "🔴"
+        report.append(f"{marker} **{probability:.0%}** chance of finishing by the sprint end ({end_date.date()}).")
+        dates = []
+        for p, point in result["percentiles"].items():
+            dates.append(f"P{p}: {point['date']}" if point["date"] else f"P{p}: beyond {self.forecaster.horizon_days} days")
+        report.append(f"- Projected completion — {' · '.join(dates)}")
+        report.append(f"- _{result['simulations']:,} simulations in {result['elapsed_ms']:.0f} ms_")
+        report.extend(self._burndown_summary())
+        return report
+
+    def _burndown_summary(self, days=10):
+        """The last few days of remaining issues, from the sprint time series."""
+        burndown = self.kb.get_burndown(self.sprint_id)[-days:]
+        if len(burndown) < 2:
+            return []
+        trail = " → ".join(f"{point['remaining']} ({point['day'][5:]})" for point in burndown)
+        return [f"- Burndown (remaining issues): {trail}"]
+
     # --- DATA-DRIVEN INTELLIGENCE: Workload Balancing ---
     def _analyze_workload_balance(self):
         """Analyzes team workload and suggests reassignments."""
@@ -158,13 +244,21 @@ class ScrumMasterAgent(BaseAgent):
         report.append(f"\n**🔍 Retrospective Insights**")
         
         # Identify "Quick Wins" (Done tickets)
-        done_issues = [i for i in sprint_issues if i['fields']['status']['name'] == 'Done']
+        done_issues = [i for i in sprint_issues if _is_done(i['fields']['status'])]
         if done_issues:
             report.append(f"- 🏆 **Completed Stories**: {len(done_issues)}")
             # List top 2
             for i in done_issues[:2]:
                 report.append(f"  - {i['key']}: {i['fields']['summary']}")
         
+        # Where the sprint's work is waiting, measured from status changelogs
+        if self.flow_analytics:
+            self.flow_analytics.refresh()
+            metrics = self.flow_analytics.metrics(issue_keys=[i['key'] for i in sprint_issues])
+            if metrics["ageing"] or metrics["resolved"]:
+                report.extend(self.flow_analytics.format_summary(metrics))
+                return report
+
         # Identify "Stuck" issues (In Progress but not Done)
         stuck_issues = [i for i in sprint_issues if i['fields']['status']['name'] in ['In Progress', 'In Review']]
         if stuck_issues:
@@ -182,11 +276,11 @@ class ScrumMasterAgent(BaseAgent):
         print("\n--- 🕵️ Scrum Master Agent (Data-Enhanced) ---")
         
         # 1. Fetch Sprint Details (Needed for Dates)
-        sprint_info_url = f"{self.jira_domain}/rest/agile/1.0/sprint/{self.sprint_id}"
         try:
-            r = requests.get(sprint_info_url, headers=self.headers, auth=self.auth)
-            r.raise_for_status()
-            sprint_details = r.json()
+            if self.snapshot:
+                sprint_details = self.snapshot.get_sprint_details()
+            else:
+                sprint_details = self.jira_service.get_sprint(self.sprint_id)
         except Exception as e:
             print(f"Warning: Could not fetch sprint details: {e}")
             sprint_details = {}
@@ -194,14 +288,14 @@ class ScrumMasterAgent(BaseAgent):
         report_lines = []
 
         # 2. Fetch Sprint Issues
-        sprint_url = f"{self.jira_domain}/rest/agile/1.0/sprint/{self.sprint_id}/issue"
         # CRITICAL: We need 'created' for Scope Creep detection
-        params = {'fields': 'summary,status,created'} 
+        fields = ['summary', 'status', 'created', self.story_points_field]
 
         try:
-            response = requests.get(sprint_url, headers=self.headers, auth=self.auth, params=params)
-            response.raise_for_status()
-            sprint_issues = response.json().get('issues', [])
+            if self.snapshot:
+                sprint_issues = self.snapshot.sprint_issues()
+            else:
+                sprint_issues = list(self.jira_service.iter_sprint_issues(self.sprint_id, fields))
             
             total_issues = len(sprint_issues)
             report_lines.append(f"**Sprint Health Report** (Total Issues: {total_issues})")
@@ -214,7 +308,7 @@ class ScrumMasterAgent(BaseAgent):
             
             # 4. Record Health & Run Data Intelligence
             if sprint_issues:
-                completed_count = self._record_sprint_health(sprint_issues)
+                completed_count = self._record_sprint_health(sprint_issues, start_date=(sprint_details.get('startDate') or '')[:10] or None)
                 report_lines.append(f"\n**Total Completed Issues**: {completed_count}")
                 
                 # A. Risk & Scope Analysis
@@ -233,16 +327,22 @@ class ScrumMasterAgent(BaseAgent):
             print("\n  [Broker] Checking Message Broker for inter-agent communication...")
             broker_messages = []
             blocker_actions = [] 
+            writes = self.write_queue.batch()
             
             while True:
-                message = self.message_broker.subscribe()
-                if message:
-                    if 'BLOCKER_DETECTED' in message['content'] or 'NO_CODE_ACTIVITY' in message['content']:
-                        action_summary = self._handle_blocker_message(message)
-                        blocker_actions.append(action_summary)
-                    broker_messages.append(f"- **{message['sender']}**: {message['content']}")
-                else:
+                messages = self.message_broker.consume(TOPIC_DEVELOPER_ALERTS, self.CONSUMER_NAME, max_messages=100)
+                if not messages:
                     break
+                escalations = []
+                for message in messages:
+                    alert_type = (message.get('payload') or {}).get('type')
+                    if alert_type in ('BLOCKER_DETECTED', 'NO_CODE_ACTIVITY'):
+                        escalations.append(self._handle_blocker_message(message, writes))
+                    broker_messages.append(f"- **{message['sender']}**: {message['content']}")
+
+                # Acknowledged only once the escalations are written, so a crash mid-way redelivers them
+                blocker_actions.extend(self._summarize_blocker_actions(escalations, writes.flush()))
+                self.message_broker.ack(TOPIC_DEVELOPER_ALERTS, self.CONSUMER_NAME, [m['offset'] for m in messages])
             
             if broker_messages:
                 report_lines.append("\n**Inter-Agent Communication:**")
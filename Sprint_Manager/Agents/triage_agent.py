@@ -1,16 +1,225 @@
 # Sprint_Manager/Agents/triage_agent.py
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 from .base_agent import BaseAgent
-from ..Services.jira_service import JiraService
+from ..Services.jira_service import JiraService, parse_jira_datetime
 from ..Services.llm_service import LLMService
+from ..Services.jira_write_queue import JiraWriteQueue
+from ..assignment_engine import AssignmentEngine
+from ..adf import get_shared_text_cache
+from ..config import get_setting
 
 class TriageAgent(BaseAgent):
-    def __init__(self, jira_domain, jira_email, api_token, kb):
+    AGENT_NAME = "TriageAgent"
+    UNTRIAGED_JQL = 'status = "To Do" AND assignee IS EMPTY'
+    FIELDS = ["key", "summary", "description", "priority", "updated"]
+
+    def __init__(self, jira_domain, jira_email, api_token, kb, snapshot=None, llm_service=None, write_queue=None):
         super().__init__(jira_domain, jira_email, api_token)
-        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain)
-        self.llm_service = LLMService()
+        self.snapshot = snapshot # Shared per-run issue snapshot (optional)
+        self.jira_service = JiraService(self.auth, self.headers, self.jira_domain, client=self.jira_client)
+        self.llm_service = llm_service or LLMService()
+        # Jira mutations are batched and flushed once per run (shared across agents when injected)
+        self.write_queue = write_queue or JiraWriteQueue(self.jira_service)
         self.kb = kb
+        self.assignment_engine = AssignmentEngine(kb)
+        # Max tickets classified in parallel (1 = sequential)
+        self.concurrency = max(1, get_setting('triage', 'concurrency', 8))
+        # Pack many tickets into each LLM prompt (False = one prompt per ticket)
+        self.batch_llm = get_setting('triage', 'batch_llm', True)
+        # Runs a failed ticket is retried in before it waits for its next Jira update
+        self.max_retry_attempts = get_setting('triage', 'max_retry_attempts', 5)
+
+    def _run_parallel(self, func, items):
+        """Maps func over items on the worker pool, returning results in input order."""
+        if self.concurrency > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                return list(executor.map(func, items))
+        return [func(item) for item in items]
+
+    def _get_description(self, issue):
+        """Plain text of the description (ADF or string), capped at the LLM prompt budget and cached per issue version."""
+        description = issue['fields'].get('description', '')
+        return get_shared_text_cache().text(issue['key'], issue['fields'].get('updated'), description,
+                                            max_chars=get_setting('llm', 'max_description_chars', 2000))
+
+    # --- STAGE 1: LLM classification (batched or concurrent) ---
+    def _classify_batch(self, issues):
+        """Classifies all tickets through the batched LLM triage API. Returns plans in input order."""
+        tickets = [
+            {"key": i['key'], "summary": i['fields']['summary'], "description": self._get_description(i)}
+            for i in issues
+        ]
+        triage_results = self.llm_service.analyze_triage_batch(tickets, max_workers=self.concurrency)
+
+        plans = []
+        for ticket in tickets:
+            plan = {"key": ticket["key"], "summary": ticket["summary"], "error": None}
+            triage_data = triage_results.get(ticket["key"])
+            if triage_data is None:
+                plan["error"] = "Failed to obtain valid LLM triage data."
+            else:
+                print(f"    🤖 {ticket['key']} LLM Prediction: {triage_data}")
+                plan["specialization"] = triage_data['specialization']
+                plan["priority"] = triage_data['priority']
+            plans.append(plan)
+        return plans
+
+    def _classify(self, issue):
+        """Runs the LLM triage for one ticket. Returns a plan dict, with 'error' set on failure."""
+        key = issue['key']
+        summary = issue['fields']['summary']
+        description = self._get_description(issue)
+
+        print(f"\n  Processing {key}: {summary}")
+        plan = {"key": key, "summary": summary, "error": None}
+
+        analysis_json = self.llm_service.analyze_triage(summary, description)
+        try:
+            triage_data = json.loads(analysis_json)
+            print(f"    🤖 {key} LLM Prediction: {triage_data}")
+        except json.JSONDecodeError:
+            print(f"    ❌ Error decoding LLM JSON for {key}")
+            plan["error"] = "Failed to parse LLM triage data."
+            return plan
+
+        plan["specialization"] = triage_data.get('specialization', 'FullStack')
+        plan["priority"] = triage_data.get('priority', 'Medium')
+        return plan
+
+    # --- STAGE 2: Assignment (whole batch at once) ---
+    def _allocate(self, plans):
+        """
+        Picks assignees for every classified ticket in one pass of the assignment engine
+        (fresh profiles, per-specialization workload heaps), then reserves all the slots
+        in the KB in a single transaction before anything is written to Jira.
+        """
+        tickets = [{"key": p["key"], "specialization": p["specialization"], "priority": p["priority"]}
+                   for p in plans if not p["error"]]
+        decisions = self.assignment_engine.load().assign(tickets)
+        self.assignment_engine.commit(decisions)
+        for plan in plans:
+            plan["dev"] = decisions.get(plan["key"])
+
+    # --- STAGE 3: Jira writes (queued, flushed together) ---
+    def _queue_writes(self, writes, plan):
+        """Queues one ticket's priority/labels, assignment and comment; they go out as one PUT + one POST."""
+        if plan["error"]:
+            return
+
+        key, specialization, predicted_priority = plan["key"], plan["specialization"], plan["priority"]
+
+        # Update Ticket Priority & Labels via JIRA API
+        # (Assuming 'labels' field can be used to store the specialization)
+        update_payload = {
+            "priority": {"name": predicted_priority},
+            "labels": [specialization]
+        }
+        writes.update_fields(key, update_payload)
+        plan["update_payload"] = update_payload
+
+        if plan["dev"]:
+            dev_id, dev_name, _ = plan["dev"]
+            writes.assign(key, dev_id)
+            # Add a comment to the ticket notifying the user (only once the assignment went through)
+            comment = (
+                f"🤖 **JIRA AutoPilot Triage**\n\n"
+                f"This ticket has been automatically analyzed and assigned to **{dev_name}** "
+                f"based on their **{specialization}** expertise and current workload.\n"
+                f"**Predicted Priority:** {predicted_priority}"
+            )
+            writes.add_comment(key, comment, requires_update=True)
+
+    def _apply(self, plans):
+        """Sends all queued triage writes and records per-ticket outcomes on the plans."""
+        writes = self.write_queue.batch()
+        for plan in plans:
+            self._queue_writes(writes, plan)
+        results = writes.flush()
+        for plan in plans:
+            if plan["error"]:
+                continue
+            plan["updated"] = bool(results.get(plan["key"], {}).get("fields"))
+            # The assignee travels in the same PUT, so it succeeded exactly when the update did
+            plan["assigned"] = plan["updated"] and bool(plan["dev"])
+
+    # --- INCREMENTAL RUNS ---
+    def _changed_since(self, issue, watermark):
+        """True if the issue was updated at or after the watermark (always True without one)."""
+        watermark_dt = parse_jira_datetime(watermark)
+        updated_dt = parse_jira_datetime(issue['fields'].get('updated'))
+        return watermark_dt is None or updated_dt is None or updated_dt >= watermark_dt
+
+    def _search_untriaged(self, keys):
+        jql = f'key in ({", ".join(keys)}) AND {self.UNTRIAGED_JQL}'
+        return {i['key']: i for i in self.jira_service.search_issues(jql, self.FIELDS)}
+
+    def _untriaged_by_key(self, keys):
+        """
+        The recorded failure keys that are still untriaged, as {key: issue}. Tickets that were
+        assigned, left 'To Do', or no longer exist in Jira (deleted or moved) are left out.
+        """
+        if not keys:
+            return {}
+        if self.snapshot and self.snapshot.is_loaded():
+            wanted = set(keys)
+            return {i['key']: i for i in self.snapshot.untriaged_issues() if i['key'] in wanted}
+        found = {}
+        for start in range(0, len(keys), 100):
+            chunk = keys[start:start + 100]
+            try:
+                found.update(self._search_untriaged(chunk))
+            except requests.exceptions.HTTPError as err:
+                if err.response is None or err.response.status_code != 400:
+                    raise
+                # One unknown key makes Jira reject the whole query; look the keys up one by one
+                for key in chunk:
+                    try:
+                        found.update(self._search_untriaged([key]))
+                    except requests.exceptions.HTTPError as key_err:
+                        if key_err.response is None or key_err.response.status_code not in (400, 404):
+                            raise
+                        print(f"  {key} no longer exists in Jira; dropping its triage failure record.")
+        return found
+
+    def _retry_issues(self, failures, tracked, changed_keys):
+        """Still-untriaged tickets that failed on earlier runs and are due for another attempt."""
+        return [issue for key, issue in tracked.items()
+                if key not in changed_keys and (failures[key]["result"] or {}).get("attempts", 0) < self.max_retry_attempts]
+
+    def _record_outcomes(self, issues, plans, watermark, failures, tracked):
+        """
+        Moves the watermark to the newest processed ticket and records the tickets that failed
+        (with their attempt count) so the next runs retry them explicitly. A ticket is retried
+        up to max_retry_attempts times; after that only a new Jira update brings it back.
+        tracked holds the recorded failures that are still untriaged; the others are forgotten.
+        """
+        by_key = {i['key']: i for i in issues}
+        outcomes = {}
+        for plan in plans:
+            if not plan["error"] and plan.get("assigned"):
+                continue
+            issue = by_key[plan["key"]]
+            previous = (failures.get(plan["key"]) or {}).get("result") or {}
+            # A ticket updated since it last failed starts counting again
+            same_version = (failures.get(plan["key"]) or {}).get("updated") == issue['fields'].get('updated')
+            attempts = previous.get("attempts", 0) + 1 if same_version else 1
+            outcomes[plan["key"]] = (issue['fields'].get('updated'), {
+                "error": plan["error"] or ("No available developer." if not plan.get("dev") else "Jira update failed."),
+                "attempts": attempts,
+            })
+            if attempts >= self.max_retry_attempts:
+                print(f"  ⚠️ {plan['key']} failed triage {attempts} time(s); waiting for its next update before retrying.")
+        # Exhausted failures that were not retried stay recorded while the ticket is still untriaged
+        for key, failure in failures.items():
+            if key in tracked and key not in outcomes and key not in by_key and (failure["result"] or {}).get("attempts", 0) >= self.max_retry_attempts:
+                outcomes[key] = (failure["updated"], failure["result"])
+        self.kb.replace_agent_results(self.AGENT_NAME, outcomes)
+
+        new_watermark = self._latest_updated(issues, watermark)
+        if new_watermark:
+            self.kb.set_watermark(self.AGENT_NAME, new_watermark)
 
     def execute(self):
         """Scans for new 'To Do' tickets, performs LLM triage, and auto-assigns."""
@@ -20,90 +229,81 @@ class TriageAgent(BaseAgent):
         triage_count = 0
 
         # JQL: Find issues in 'To Do' that are unassigned
-        # Note: We fetch 'customfield_10002' assuming it is Story Points, 
+        # Note: We fetch 'customfield_10002' assuming it is Story Points,
         # but for triage, we primarily need summary and description.
-        search_url = f"{self.jira_domain}/rest/api/3/search/jql"
-        data = { 
-            "jql": 'status = "To Do" AND assignee IS EMPTY', 
-            "fields": ["key", "summary", "description", "priority"] 
-        } 
-        
+        jql = self.UNTRIAGED_JQL
+        fields = self.FIELDS
+
         try:
-            response = requests.post(search_url, headers=self.headers, json=data, auth=self.auth)
-            response.raise_for_status()
-            untriaged_issues = response.json().get('issues', [])
-            
+            # Only tickets changed since the last processed 'updated' timestamp are looked at
+            watermark = self.kb.get_watermark(self.AGENT_NAME)
+            failures = self.kb.get_agent_results(self.AGENT_NAME)
+
+            # Served from the shared snapshot when it is already loaded (or there is no watermark yet);
+            # otherwise only the tickets changed since the watermark are queried
+            if self.snapshot and (watermark is None or self.snapshot.is_loaded()):
+                untriaged_issues = [i for i in self.snapshot.untriaged_issues() if self._changed_since(i, watermark)]
+            else:
+                if watermark:
+                    jql += f' AND {self.jira_service.updated_since_clause(watermark)}'
+                untriaged_issues = list(self.jira_service.search_issues(jql, fields))
+            # Tickets that failed on earlier runs are retried explicitly (the watermark has moved past them)
+            tracked = self._untriaged_by_key(list(failures))
+            retries = self._retry_issues(failures, tracked, {i['key'] for i in untriaged_issues})
+            if retries:
+                print(f"  Retrying {len(retries)} ticket(s) that failed triage on earlier runs.")
+            untriaged_issues += retries
+
             if not untriaged_issues:
+                if failures:
+                    # Recorded failures that are no longer untriaged (handled by hand) are forgotten
+                    self._record_outcomes([], [], watermark, failures, tracked)
                 print("  No untriaged tickets found.")
                 return "No untriaged, unassigned tickets found in 'To Do'."
 
             report_lines.append(f"Found {len(untriaged_issues)} untriaged tickets. Starting autonomous triage...")
 
-            for issue in untriaged_issues:
-                key = issue['key']
-                summary = issue['fields']['summary']
-                description = issue['fields'].get('description', '')
-                
-                # Handling description if it's a complex ADF object (Atlassian Document Format)
-                if isinstance(description, dict):
-                     # Simplified extraction for ADF; in prod, use a proper parser
-                    description = "Complex description content" 
-
-                print(f"\n  Processing {key}: {summary}")
-
-                # 1. LLM Analysis
-                analysis_json = self.llm_service.analyze_triage(summary, str(description))
-                try:
-                    triage_data = json.loads(analysis_json)
-                    print(f"    🤖 LLM Prediction: {triage_data}")
-                except json.JSONDecodeError:
-                    print(f"    ❌ Error decoding LLM JSON for {key}")
-                    report_lines.append(f"- {key}: Failed to parse LLM triage data.")
+            # Pipeline: classify in parallel -> allocate serially -> write to Jira in one flush
+            if self.batch_llm:
+                plans = self._classify_batch(untriaged_issues)
+            else:
+                plans = self._run_parallel(self._classify, untriaged_issues)
+            self._allocate(plans)
+            self._apply(plans)
+
+            released = {}
+            for plan in plans:
+                key = plan["key"]
+                if plan["error"]:
+                    report_lines.append(f"- {key}: {plan['error']}")
                     continue
 
-                specialization = triage_data.get('specialization', 'FullStack')
-                predicted_priority = triage_data.get('priority', 'Medium')
-                
-                # 2. Update Ticket Priority & Labels via JIRA API
-                # (Assuming 'labels' field can be used to store the specialization)
-                update_payload = {
-                    "priority": {"name": predicted_priority},
-                    "labels": [specialization]
-                }
-                self.jira_service.update_issue(key, update_payload)
-                report_lines.append(f"- **{key}**: Classified as **{specialization}**, Priority set to **{predicted_priority}**.")
-
-                # 3. Intelligent Assignment via Knowledge Base
-                best_dev = self.kb.get_best_assignee(specialization)
-                
-                if best_dev:
-                    dev_id, dev_name, current_load = best_dev
-                    
-                    # Assign in Jira
-                    if self.jira_service.assign_issue(key, dev_id):
-                        # Update KB workload (Assuming +1 for a new task)
-                        new_load = current_load + 1
-                        self.kb.update_developer_workload(dev_id, new_load)
-                        
-                        action_msg = f"    ✅ Auto-Assigned to **{dev_name}** (Load: {current_load} -> {new_load})"
-                        print(action_msg)
-                        report_lines.append(action_msg)
-                        
-                        # Add a comment to the ticket notifying the user
-                        comment = (
-                            f"🤖 **JIRA AutoPilot Triage**\n\n"
-                            f"This ticket has been automatically analyzed and assigned to **{dev_name}** "
-                            f"based on their **{specialization}** expertise and current workload.\n"
-                            f"**Predicted Priority:** {predicted_priority}"
-                        )
-                        self.jira_service.add_comment(key, comment)
-                        triage_count += 1
-                    else:
-                        report_lines.append(f"    ❌ Failed to assign {key} to {dev_name} in Jira.")
+                if plan["updated"] and self.snapshot:
+                    self.snapshot.apply_update(key, plan["update_payload"])
+                report_lines.append(f"- **{key}**: Classified as **{plan['specialization']}**, Priority set to **{plan['priority']}**.")
+
+                if not plan["dev"]:
+                    report_lines.append(f"    ⚠️ No available developer found for specialization: {plan['specialization']}")
+                    continue
+
+                dev_id, dev_name, current_load = plan["dev"]
+                if plan["assigned"]:
+                    if self.snapshot:
+                        self.snapshot.apply_update(key, {"assignee": {"accountId": dev_id, "displayName": dev_name}})
+                    action_msg = f"    ✅ Auto-Assigned to **{dev_name}** (Load: {current_load} -> {current_load + 1})"
+                    print(action_msg)
+                    report_lines.append(action_msg)
+                    triage_count += 1
                 else:
-                    report_lines.append(f"    ⚠️ No available developer found for specialization: {specialization}")
+                    # Release the slot reserved by the allocator
+                    released[dev_id] = released.get(dev_id, 0) - 1
+                    report_lines.append(f"    ❌ Failed to assign {key} to {dev_name} in Jira.")
+
+            if released:
+                self.kb.adjust_developer_workloads(released)
 
             report_lines.append(f"\n**Summary:** {triage_count} tickets autonomously triaged and assigned.")
+            self._record_outcomes(untriaged_issues, plans, watermark, failures, tracked)
 
         except requests.exceptions.HTTPError as err:
             print(f"HTTP Error: {err}")
@@ -111,5 +311,5 @@ class TriageAgent(BaseAgent):
         except Exception as e:
             print(f"An error occurred: {e}")
             report_lines.append(f"An unexpected error occurred: {e}")
-        
-        return "\n".join(report_lines)
\ No newline at end of file
+
+        return "\n".join(report_lines)
@@ -1,20 +1,213 @@
 # Sprint_Manager/Services/git_service.py
 from datetime import datetime, timedelta
+import json
+import os
 import random
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from ..config import get_setting
+
+# git log records: sha, committer timestamp, full message; fields and records split by control characters
+LOG_FORMAT = "%H%x1f%ct%x1f%B%x1e"
+
+class GitIndex:
+    """
+    Persistent index from Jira issue key to its latest commit activity across local repositories.
+    Each refresh streams `git log` once over the commits that are new since the branch tips seen
+    last time (so a repository is read in full only on the first run), extracts issue keys from
+    commit messages and branch names, and upserts per-key totals. Lookups are served from an
+    in-memory dict loaded from the index.
+    """
+
+    def __init__(self, repositories, db_path=None, key_pattern=None, project_keys=None):
+        self.repositories = [os.path.abspath(os.path.expanduser(repo)) for repo in repositories]
+        self.db_path = db_path or get_setting('git', 'index_path', 'data/git_index.db')
+        self.key_pattern = re.compile(key_pattern or get_setting('git', 'key_pattern', r'\b[A-Z][A-Z0-9]+-\d+\b'))
+        # Branch names are usually lower case ("feature/proj-123-login")
+        self.branch_key_pattern = re.compile(self.key_pattern.pattern, re.IGNORECASE)
+        self.project_keys = {p.upper() for p in (project_keys if project_keys is not None else get_setting('git', 'project_keys', []))}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._setup_database()
+        self.last_activity = self._load()
+
+    def _setup_database(self):
+        with self._lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS git_index_state (
+                    repo_path TEXT PRIMARY KEY,
+                    ref_tips TEXT NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS git_issue_activity (
+                    issue_key TEXT NOT NULL,
+                    repo_path TEXT NOT NULL,
+                    last_commit_at INTEGER NOT NULL,
+                    last_sha TEXT NOT NULL,
+                    commit_count INTEGER NOT NULL,
+                    PRIMARY KEY (issue_key, repo_path)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.commit()
+
+    def _load(self):
+        """{issue_key: latest commit timestamp} over every repository."""
+        with self._lock:
+            rows = self.conn.execute('SELECT issue_key, MAX(last_commit_at) FROM git_issue_activity GROUP BY issue_key').fetchall()
+        return dict(rows)
+
+    def _keys(self, text, pattern):
+        keys = {key.upper() for key in pattern.findall(text)}
+        if self.project_keys:
+            keys = {key for key in keys if key.rsplit('-', 1)[0] in self.project_keys}
+        return keys
+
+    # --- GIT ---
+    def _git(self, repo, *args, stdin=None):
+        result = subprocess.run(["git", "-C", repo, *args], input=stdin, capture_output=True, text=True, check=True)
+        return result.stdout
+
+    def _ref_tips(self, repo):
+        """{ref name: (sha, committer timestamp)} for local and remote-tracking branches."""
+        output = self._git(repo, "for-each-ref", "--format=%(refname:short)%1f%(objectname)%1f%(committerdate:unix)", "refs/heads", "refs/remotes")
+        tips = {}
+        for line in output.splitlines():
+            name, sha, timestamp = line.split("\x1f")
+            if timestamp:
+                tips[name] = (sha, int(timestamp))
+        return tips
+
+    def _existing(self, repo, shas):
+        """The subset of shas still present in the repository (rewritten history drops some)."""
+        if not shas:
+            return []
+        output = self._git(repo, "cat-file", "--batch-check=%(objectname) %(objecttype)", stdin="\n".join(shas) + "\n")
+        return [line.split()[0] for line in output.splitlines() if line.endswith(" commit")]
+
+    def _iter_commits(self, repo, exclude):
+        """Streams (sha, timestamp, message) for commits on any branch not reachable from `exclude`."""
+        args = ["git", "-C", repo, "log", "--branches", "--remotes", f"--format={LOG_FORMAT}"]
+        if exclude:
+            args += ["--not", *exclude]
+        with subprocess.Popen(args, stdout=subprocess.PIPE, text=True, encoding="utf-8", errors="replace") as process:
+            buffer = ""
+            for chunk in iter(lambda: process.stdout.read(1 << 16), ""):
+                buffer += chunk
+                *records, buffer = buffer.split("\x1e")
+                for record in records:
+                    sha, timestamp, message = record.lstrip("\n").split("\x1f", 2)
+                    yield sha, int(timestamp), message
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, args)
+
+    # --- INDEXING ---
+    def _index_repository(self, repo):
+        with self._lock:
+            row = self.conn.execute('SELECT ref_tips FROM git_index_state WHERE repo_path = ?', (repo,)).fetchone()
+        previous_tips = json.loads(row[0]) if row else []
+        tips = self._ref_tips(repo)
+
+        activity = {}  # issue_key -> [last_commit_at, last_sha, new_commits]
+        def record(key, timestamp, sha, commits):
+            entry = activity.setdefault(key, [timestamp, sha, 0])
+            if timestamp > entry[0]:
+                entry[0], entry[1] = timestamp, sha
+            entry[2] += commits
+
+        commits = 0
+        for sha, timestamp, message in self._iter_commits(repo, self._existing(repo, previous_tips)):
+            commits += 1
+            for key in self._keys(message, self.key_pattern):
+                record(key, timestamp, sha, 1)
+        for name, (sha, timestamp) in tips.items():
+            for key in self._keys(name, self.branch_key_pattern):
+                record(key, timestamp, sha, 0)
+
+        with self._lock:
+            self.conn.executemany('''
+                INSERT INTO git_issue_activity (issue_key, repo_path, last_commit_at, last_sha, commit_count) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (issue_key, repo_path) DO UPDATE SET
+                    last_sha = CASE WHEN excluded.last_commit_at > last_commit_at THEN excluded.last_sha ELSE last_sha END,
+                    last_commit_at = MAX(last_commit_at, excluded.last_commit_at),
+                    commit_count = commit_count + excluded.commit_count
+            ''', [(key, repo, timestamp, sha, count) for key, (timestamp, sha, count) in activity.items()])
+            self.conn.execute('INSERT OR REPLACE INTO git_index_state (repo_path, ref_tips, indexed_at) VALUES (?, ?, ?)',
+                              (repo, json.dumps(sorted({sha for sha, _ in tips.values()})), time.time()))
+            self.conn.commit()
+            for key, (timestamp, _, _) in activity.items():
+                if timestamp > self.last_activity.get(key, 0):
+                    self.last_activity[key] = timestamp
+        return commits, len(activity)
+
+    def refresh(self):
+        """Indexes the new commits of every repository. A repository that fails is skipped until the next refresh."""
+        started = time.perf_counter()
+        total_commits = total_keys = 0
+        for repo in self.repositories:
+            try:
+                commits, keys = self._index_repository(repo)
+                total_commits += commits
+                total_keys += keys
+            except (OSError, subprocess.CalledProcessError, ValueError) as e:
+                print(f"  [Git] Could not index {repo}: {e}")
+        print(f"  [Git] Indexed {total_commits} new commit(s) touching {total_keys} issue key(s) "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
 
 class GitService:
-    def __init__(self, jira_domain=None, api_key=None):
+    def __init__(self, jira_domain=None, api_key=None, repositories=None, index=None):
         """
-        A simulated Git Service (e.g., GitHub/GitLab).
-        In a real application, this would use a platform's API to check commits.
+        Code activity for Jira issues. Backed by a GitIndex over the local repositories listed
+        in git.repositories; without any configured, activity is simulated as before.
         """
-        print("Git Service (Simulated) initialized.")
+        repositories = repositories if repositories is not None else get_setting('git', 'repositories', [])
+        self.refresh_seconds = get_setting('git', 'refresh_seconds', 60)
+        self.index = index or (GitIndex(repositories) if repositories else None)
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        if self.index:
+            print(f"Git Service initialized with {len(self.index.repositories)} local repositor{'y' if len(self.index.repositories) == 1 else 'ies'}.")
+        else:
+            print("Git Service (Simulated) initialized.")
+
+    def _ensure_fresh(self):
+        """Brings the index up to date at most once per refresh_seconds (agents check many issues per run)."""
+        with self._refresh_lock:
+            if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+                self.index.refresh()
+                self._refreshed_at = time.monotonic()
+
+    def last_activity(self, issue_key):
+        """Timestamp of the latest commit or branch update mentioning the issue, or None."""
+        if not self.index:
+            return None
+        self._ensure_fresh()
+        timestamp = self.index.last_activity.get(issue_key.upper())
+        return datetime.fromtimestamp(timestamp) if timestamp else None
 
     def check_recent_activity(self, issue_key, lookback_days=2):
         """
-        Simulates checking for code commits or PR activity linked to an issue key.
+        Checks for code commits or branch activity linked to an issue key.
         Returns True if activity is recent (within lookback_days), False otherwise.
         """
+        if self.index:
+            last = self.last_activity(issue_key)
+            if last and last >= datetime.now() - timedelta(days=lookback_days):
+                print(f"  [Git] Found recent activity for {issue_key} at {last.strftime('%Y-%m-%d %H:%M')}.")
+                return True
+            print(f"  [Git] No activity for {issue_key} in the last {lookback_days} day(s)"
+                  f"{' (last: ' + last.strftime('%Y-%m-%d %H:%M') + ')' if last else ''}.")
+            return False
+
         # --- Simulation Logic ---
         # 50% chance of no activity to simulate "stalled" work
         if random.random() < 0.5:
@@ -26,4 +219,4 @@ class GitService:
             # Simulate no activity for the lookback period
             no_activity_time = datetime.now() - timedelta(days=lookback_days + random.randint(1, 3))
             print(f"  [Git] No recent simulated activity found for {issue_key}. Last check: {no_activity_time.strftime('%Y-%m-%d %H:%M')}.")
-            return False
\ No newline at end of file
+            return False
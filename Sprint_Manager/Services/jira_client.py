@@ -0,0 +1,131 @@
+# Sprint_Manager/Services/jira_client.py
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from ..config import get_setting
+from .rate_limiter import get_limiter, parse_retry_after
+
+# Methods that are safe to resend after a timeout or 5xx. POSTs to the search endpoints
+# only read, so they count too. A 429 is retried for any method: Jira rejected it unprocessed.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+class JiraClient:
+    """
+    A single keep-alive HTTP client for the Jira REST APIs.
+    All agents and services share one instance per (domain, account), so every
+    call after the first reuses an already-open TCP+TLS connection from the pool.
+    """
+    _shared_clients = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, domain, auth, headers=None):
+        self.domain = domain.rstrip('/')
+        self.auth = auth
+        self.headers = headers or {"Accept": "application/json"}
+        self.timeout = (
+            get_setting('jira', 'connect_timeout', 5),
+            get_setting('jira', 'read_timeout', 30),
+        )
+
+        # Pool sizing: pool_connections = number of hosts cached, pool_maxsize = sockets per host
+        self.adapter = HTTPAdapter(
+            pool_connections=get_setting('jira', 'pool_connections', 4),
+            pool_maxsize=get_setting('jira', 'pool_maxsize', 16),
+        )
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.limiter = get_limiter("jira")
+        print("Jira Client (pooled, keep-alive) initialized.")
+
+    @classmethod
+    def shared(cls, domain, email, api_token):
+        """Returns the process-wide client for this Jira account, creating it on first use."""
+        key = (domain.rstrip('/'), email)
+        with cls._shared_lock:
+            client = cls._shared_clients.get(key)
+            if client is None:
+                client = cls(domain, (email, api_token))
+                cls._shared_clients[key] = client
+            return client
+
+    def _url(self, path):
+        """Accepts either a full URL or a '/rest/...' path relative to the Jira domain."""
+        return path if path.startswith("http") else f"{self.domain}{path}"
+
+    def _is_idempotent(self, method, url):
+        return method in IDEMPOTENT_METHODS or (method == "POST" and urlparse(url).path.rstrip('/').endswith(("/search", "/search/jql")))
+
+    def request(self, method, path, **kwargs):
+        """
+        Sends a request over the pooled session with the configured timeouts, paced by the
+        shared Jira rate limiter. Throttled (429) and, for idempotent calls, transient
+        failures are retried with Retry-After / jittered backoff. The last response is returned.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        method = method.upper()
+        url = self._url(path)
+        idempotent = self._is_idempotent(method, url)
+        for attempt in range(self.limiter.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not idempotent or attempt == self.limiter.max_retries:
+                    self.limiter.record_failure()
+                    raise
+                self.limiter.sleep_before_retry(attempt)
+                continue
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                self.limiter.on_rate_limited(retry_after)
+            elif response.headers.get("X-RateLimit-NearLimit", "").lower() == "true":
+                self.limiter.on_near_limit()
+            elif response.status_code < 500:
+                self.limiter.on_success()
+
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRYABLE_STATUSES)
+            if not retryable:
+                return response
+            if attempt == self.limiter.max_retries:
+                self.limiter.record_failure()
+                return response
+            print(f"  [Jira] {method} {urlparse(url).path} -> {response.status_code}, retrying (attempt {attempt + 1}/{self.limiter.max_retries})...")
+            self.limiter.sleep_before_retry(attempt, retry_after)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def get_connection_stats(self):
+        """
+        Returns per-host connection reuse stats from the underlying urllib3 pools:
+        {host: {"requests": n, "connections": n, "reused": n}}
+        """
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            host = pool.host or urlparse(self.domain).hostname
+            entry = stats.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+            entry["requests"] += pool.num_requests
+            entry["connections"] += pool.num_connections
+            entry["reused"] += max(pool.num_requests - pool.num_connections, 0)
+        return stats
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
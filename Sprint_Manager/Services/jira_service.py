@@ -1,16 +1,162 @@
+import math
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .jira_client import JiraClient
+
+JIRA_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+def parse_jira_datetime(value):
+    """Parses Jira's '2025-01-31T10:15:00.000+0000' timestamps. Returns None when unparseable."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, JIRA_DATETIME_FORMAT)
+    except ValueError:
+        return None
+
+def to_jql_datetime(value, tz, overlap_minutes=1):
+    """
+    Converts a Jira timestamp into a JQL date literal ("yyyy/MM/dd HH:mm") in tz, which must be
+    the Jira user's profile time zone: that is how Jira reads the literal, whatever the host's zone.
+    JQL only has minute precision, so the result is pulled back by a small overlap;
+    callers must tolerate seeing the boundary issues twice.
+    """
+    parsed = parse_jira_datetime(value)
+    if parsed is None:
+        return None
+    local = parsed.astimezone(tz) - timedelta(minutes=overlap_minutes)
+    return local.strftime("%Y/%m/%d %H:%M")
 
 class JiraService:
-    def __init__(self, auth, headers, domain):
+    def __init__(self, auth, headers, domain, client=None):
         self.auth = auth
         self.headers = headers
         self.domain = domain
+        # Injected by the owning agent so all services share one connection pool
+        self.client = client or JiraClient(domain, auth, headers)
+
+    # --- PAGINATED SEARCH ---
+
+    def _iter_pages(self, fetch_page, first_cursor):
+        """
+        Yields issues one at a time across all pages. While the caller works through
+        page N, page N+1 is already being fetched on a background thread.
+        fetch_page(cursor) must return (issues, next_cursor); next_cursor is None on the last page.
+        """
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(fetch_page, first_cursor)
+            while future is not None:
+                issues, next_cursor = future.result()
+                future = prefetcher.submit(fetch_page, next_cursor) if next_cursor is not None else None
+                for issue in issues:
+                    yield issue
+
+    def search_issues(self, jql, fields, page_size=100, expand=None):
+        """Streams every issue matching the JQL, following nextPageToken cursors."""
+        url = f"{self.domain}/rest/api/3/search/jql"
+
+        def fetch_page(page_token):
+            data = {"jql": jql, "fields": fields, "maxResults": page_size}
+            if expand:
+                data["expand"] = expand
+            if page_token:
+                data["nextPageToken"] = page_token
+            response = self.client.post(url, json=data)
+            response.raise_for_status()
+            payload = response.json()
+            next_token = payload.get('nextPageToken')
+            if payload.get('isLast', next_token is None):
+                next_token = None
+            return payload.get('issues', []), next_token
+
+        return self._iter_pages(fetch_page, "")
+
+    def _iter_agile_issues(self, url, fields, page_size, jql=None):
+        """Streams issues from an Agile API issue listing, following startAt offsets."""
+        fields_param = ",".join(fields) if isinstance(fields, (list, tuple)) else fields
+
+        def fetch_page(start_at):
+            params = {"fields": fields_param, "startAt": start_at, "maxResults": page_size}
+            if jql:
+                params["jql"] = jql
+            response = self.client.get(url, params=params)
+            response.raise_for_status()
+            payload = response.json()
+            issues = payload.get('issues', [])
+            next_start = start_at + len(issues)
+            if not issues or next_start >= payload.get('total', 0):
+                next_start = None
+            return issues, next_start
+
+        return self._iter_pages(fetch_page, 0)
+
+    def iter_sprint_issues(self, sprint_id, fields, page_size=50):
+        """Streams every issue in a sprint from the Agile API, following startAt offsets."""
+        return self._iter_agile_issues(f"{self.domain}/rest/agile/1.0/sprint/{sprint_id}/issue", fields, page_size)
+
+    def iter_board_issues(self, board_id, fields, jql=None, page_size=100):
+        """Streams every issue on a board (all sprints and backlog), optionally narrowed by JQL."""
+        return self._iter_agile_issues(f"{self.domain}/rest/agile/1.0/board/{board_id}/issue", fields, page_size, jql=jql)
+
+    def iter_issue_changelog(self, issue_key, page_size=100):
+        """Streams an issue's full changelog (oldest first), for issues whose embedded changelog was truncated."""
+        url = f"{self.domain}/rest/api/3/issue/{issue_key}/changelog"
+
+        def fetch_page(start_at):
+            response = self.client.get(url, params={"startAt": start_at, "maxResults": page_size})
+            response.raise_for_status()
+            payload = response.json()
+            histories = payload.get('values', [])
+            next_start = start_at + len(histories)
+            if not histories or payload.get('isLast', next_start >= payload.get('total', 0)):
+                next_start = None
+            return histories, next_start
+
+        return self._iter_pages(fetch_page, 0)
+
+    def get_current_user(self):
+        """Returns the account the API token belongs to (the JQL 'currentUser()'). Cached after the first call."""
+        if getattr(self, '_current_user', None) is None:
+            response = self.client.get(f"{self.domain}/rest/api/3/myself")
+            response.raise_for_status()
+            self._current_user = response.json()
+        return self._current_user
+
+    def jql_timezone(self):
+        """The API user's profile time zone (JQL date literals are interpreted in it), or None if unknown."""
+        try:
+            return ZoneInfo(self.get_current_user().get('timeZone') or '')
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+
+    def updated_since_clause(self, value, overlap_minutes=1):
+        """
+        JQL clause matching issues updated at or after a Jira timestamp (minus a small overlap).
+        Uses a literal in the profile time zone; if that zone is unknown, falls back to a
+        relative '-Nm' offset, which does not depend on any time zone.
+        """
+        parsed = parse_jira_datetime(value)
+        if parsed is None:
+            return None
+        tz = self.jql_timezone()
+        if tz is not None:
+            return f'updated >= "{to_jql_datetime(value, tz, overlap_minutes)}"'
+        minutes = math.ceil((datetime.now(timezone.utc) - parsed).total_seconds() / 60) + overlap_minutes
+        return f'updated >= -{max(minutes, overlap_minutes)}m'
+
+    def get_sprint(self, sprint_id):
+        """Fetches sprint metadata (name, state, startDate, endDate)."""
+        response = self.client.get(f"{self.domain}/rest/agile/1.0/sprint/{sprint_id}")
+        response.raise_for_status()
+        return response.json()
 
     def get_comments_for_issue(self, issue_key):
         """Fetches all comments for a specific Jira issue."""
         try:
             url = f"{self.domain}/rest/api/3/issue/{issue_key}/comment"
-            response = requests.get(url, headers=self.headers, auth=self.auth)
+            response = self.client.get(url)
             response.raise_for_status()
             return response.json().get('comments', [])
         except requests.exceptions.HTTPError as err:
@@ -23,7 +169,7 @@ class JiraService:
         """Updates fields of a specific Jira issue."""
         try:
             url = f"{self.domain}/rest/api/3/issue/{issue_key}"
-            response = requests.put(url, headers=self.headers, json={"fields": updates}, auth=self.auth)
+            response = self.client.put(url, json={"fields": updates})
             response.raise_for_status()
             print(f"  [JiraService] Successfully updated issue {issue_key}.")
             return True
@@ -47,7 +193,7 @@ class JiraService:
                     ]
                 }
             }
-            response = requests.post(url, headers=self.headers, json=comment_data, auth=self.auth)
+            response = self.client.post(url, json=comment_data)
             response.raise_for_status()
             print(f"  [JiraService] Successfully added comment to {issue_key}.")
             return True
@@ -60,7 +206,7 @@ class JiraService:
         try:
             url = f"{self.domain}/rest/api/3/issue/{issue_key}/assignee"
             assignment_data = {"accountId": account_id} 
-            response = requests.put(url, headers=self.headers, json=assignment_data, auth=self.auth)
+            response = self.client.put(url, json=assignment_data)
             response.raise_for_status()
             print(f"  [JiraService] Successfully assigned {issue_key} to {account_id}.")
             return True
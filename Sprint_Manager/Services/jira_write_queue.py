@@ -0,0 +1,152 @@
+# Sprint_Manager/Services/jira_write_queue.py
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ..config import get_setting
+
+class WriteBatch:
+    """
+    The pending Jira mutations of one agent step.
+    Field updates (assignee included) are merged per issue into a single PUT, and all
+    comments for an issue are de-duplicated and posted as one comment, after the PUT.
+    Nothing is sent until flush().
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._fields = {}    # issue_key -> merged fields payload
+        self._comments = {}  # issue_key -> [(text, requires_update, skip_if_recent)]
+        self.operations = 0
+
+    def update_fields(self, issue_key, fields):
+        """Queues field changes; later values win for the same field."""
+        with self._lock:
+            self._fields.setdefault(issue_key, {}).update(fields)
+            self.operations += 1
+
+    def assign(self, issue_key, account_id):
+        """Queues an assignment, sent through the same PUT as the other field changes."""
+        self.update_fields(issue_key, {"assignee": {"accountId": account_id}})
+
+    def add_comment(self, issue_key, text, requires_update=False, skip_if_recent=False):
+        """
+        Queues a comment. requires_update: only post it if this issue's field PUT succeeded.
+        skip_if_recent: drop it if AutoPilot already commented on the issue recently (e.g. an
+        escalation for a ticket another agent nudged earlier in the same run).
+        """
+        with self._lock:
+            entries = self._comments.setdefault(issue_key, [])
+            if all(existing[0] != text for existing in entries):
+                entries.append((text, requires_update, skip_if_recent))
+            self.operations += 1
+
+    def _flush_issue(self, issue_key, fields, comments):
+        result = {"fields": None, "comment": None, "skipped_comments": 0}
+        if fields:
+            result["fields"] = self.queue.jira_service.update_issue(issue_key, fields)
+            self.queue._count_request(result["fields"])
+
+        texts = []
+        for text, requires_update, skip_if_recent in comments:
+            if (requires_update and not result["fields"]) or (skip_if_recent and self.queue.recently_commented(issue_key)):
+                result["skipped_comments"] += 1
+                continue
+            if self.queue.already_posted(issue_key, text):
+                result["skipped_comments"] += 1
+                continue
+            texts.append(text)
+        if texts:
+            result["comment"] = self.queue.jira_service.add_comment(issue_key, "\n\n".join(texts))
+            self.queue._count_request(result["comment"])
+            if result["comment"]:
+                self.queue._remember_comments(issue_key, texts)
+        return issue_key, result
+
+    def flush(self):
+        """
+        Sends every queued mutation with bounded concurrency (one worker per issue).
+        Returns {issue_key: {"fields": bool|None, "comment": bool|None, "skipped_comments": n}}.
+        """
+        with self._lock:
+            fields, comments = self._fields, self._comments
+            operations = self.operations
+            self._fields, self._comments, self.operations = {}, {}, 0
+        issue_keys = list(dict.fromkeys(list(fields) + list(comments)))
+        if not issue_keys:
+            return {}
+
+        work = [(key, fields.get(key), comments.get(key, [])) for key in issue_keys]
+        workers = min(self.queue.max_workers, len(work))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = dict(executor.map(lambda item: self._flush_issue(*item), work))
+        else:
+            results = dict(self._flush_issue(*item) for item in work)
+
+        sent = sum((r["fields"] is not None) + (r["comment"] is not None) for r in results.values())
+        self.queue._count_operations(operations)
+        print(f"  [Jira Writes] Flushed {operations} queued mutation(s) as {sent} request(s) across {len(issue_keys)} issue(s).")
+        return results
+
+class JiraWriteQueue:
+    """
+    Write-behind queue for Jira mutations, shared by every agent in a run.
+    Each agent step collects its writes in a WriteBatch and flushes it when the step ends.
+    The queue remembers what AutoPilot commented recently, so repeated or overlapping
+    comments from different agents are not posted twice.
+    """
+
+    def __init__(self, jira_service, max_workers=None, comment_window_seconds=None):
+        self.jira_service = jira_service
+        self.max_workers = max(1, max_workers or get_setting('jira_writes', 'max_workers', 8))
+        self.comment_window_seconds = comment_window_seconds if comment_window_seconds is not None \
+            else get_setting('jira_writes', 'comment_window_seconds', 3600)
+        self._lock = threading.Lock()
+        self._recent = {}  # issue_key -> {text_hash: posted_at}
+        self.stats = {"operations": 0, "requests": 0, "failed": 0}
+
+    def batch(self):
+        """Starts a new batch of writes (one per agent step)."""
+        return WriteBatch(self)
+
+    # --- RECENT COMMENTS ---
+    def _hash(self, text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _live_entries(self, issue_key, now):
+        entries = self._recent.get(issue_key, {})
+        for text_hash in [h for h, posted_at in entries.items() if now - posted_at > self.comment_window_seconds]:
+            del entries[text_hash]
+        return entries
+
+    def recently_commented(self, issue_key):
+        with self._lock:
+            return bool(self._live_entries(issue_key, time.time()))
+
+    def already_posted(self, issue_key, text):
+        with self._lock:
+            return self._hash(text) in self._live_entries(issue_key, time.time())
+
+    def _remember_comments(self, issue_key, texts):
+        now = time.time()
+        with self._lock:
+            entries = self._recent.setdefault(issue_key, {})
+            for text in texts:
+                entries[self._hash(text)] = now
+
+    # --- STATS ---
+    def _count_request(self, ok):
+        with self._lock:
+            self.stats["requests"] += 1
+            if not ok:
+                self.stats["failed"] += 1
+
+    def _count_operations(self, operations):
+        with self._lock:
+            self.stats["operations"] += operations
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,115 @@
+# Sprint_Manager/Services/llm_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+from ..config import get_setting
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache for LLM responses.
+    Keys are a SHA-256 of (prompt template version, model name, input text), so a
+    response is reused only while all three are unchanged. Entries expire after a
+    TTL and the table is kept size-bounded by evicting least-recently-used rows.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=None, max_entries=None):
+        self.db_path = db_path or get_setting('llm_cache', 'path', 'data/llm_cache.db')
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else get_setting('llm_cache', 'ttl_hours', 168) * 3600
+        self.max_entries = max_entries if max_entries is not None else get_setting('llm_cache', 'max_entries', 5000)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # LLM calls run on worker threads, so one connection is shared behind a lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._setup_database()
+
+    def _setup_database(self):
+        """Creates the cache table and its LRU index if they don't already exist."""
+        with self._lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)')
+            self.conn.commit()
+
+    @staticmethod
+    def make_key(prompt_version, model_name, input_text):
+        """Content address for one (template version, model, input) triple."""
+        digest = hashlib.sha256()
+        for part in (prompt_version, model_name, input_text):
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def get(self, cache_key):
+        """Returns the cached response, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute('SELECT response, created_at FROM llm_cache WHERE cache_key = ?', (cache_key,)).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                self.conn.execute('UPDATE llm_cache SET last_access = ? WHERE cache_key = ?', (now, cache_key))
+                self.conn.commit()
+                self.hits += 1
+                return row[0]
+            if row:
+                self.conn.execute('DELETE FROM llm_cache WHERE cache_key = ?', (cache_key,))
+                self.conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, cache_key, response):
+        """Stores a response and evicts least-recently-used rows beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO llm_cache (cache_key, response, created_at, last_access) VALUES (?, ?, ?, ?)',
+                              (cache_key, response, now, now))
+            count = self.conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+            if count > self.max_entries:
+                overflow = count - self.max_entries
+                self.conn.execute('''
+                    DELETE FROM llm_cache WHERE cache_key IN (
+                        SELECT cache_key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                    )
+                ''', (overflow,))
+                self.evictions += overflow
+            self.conn.commit()
+
+    def purge_expired(self):
+        """Deletes every entry older than the TTL. Returns the number of rows removed."""
+        with self._lock:
+            cursor = self.conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+            self.conn.commit()
+            return cursor.rowcount
+
+    def get_stats(self):
+        """Hit/miss/eviction counters for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache():
+    """Returns the process-wide cache so every LLMService instance shares one connection."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache()
+        return _shared_cache
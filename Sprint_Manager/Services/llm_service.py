@@ -1,13 +1,115 @@
 import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
+from .llm_cache import get_shared_cache
+from .rate_limiter import get_limiter
+from ..config import get_setting
+
+# Bump a version whenever its prompt template changes, so stale cached answers are not reused
+PROMPT_VERSIONS = {
+    "comment": "comment-v1",
+    "triage": "triage-v1",
+    "triage_batch": "triage-batch-v1",
+    "comment_batch": "comment-batch-v1",
+    "release_batch": "release-batch-v1",
+}
+
+# Allowed values for triage answers; anything else is treated as a failed entry
+TRIAGE_ISSUE_TYPES = ('Bug', 'Story', 'Task')
+TRIAGE_PRIORITIES = ('High', 'Medium', 'Low')
+TRIAGE_SPECIALIZATIONS = ('Frontend', 'Backend', 'DevOps', 'FullStack')
+COMMENT_SENTIMENTS = ('Positive', 'Neutral', 'Negative')
+RELEASE_CATEGORIES = ('Feature', 'Bug Fix', 'Improvement', 'Internal')
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for batch packing."""
+    return len(text) // 4 + 1
+
+def pack_batches(items, cost_fn, token_budget, max_batch_size):
+    """Greedily groups items into batches whose summed cost stays within the token budget."""
+    batches, current, current_cost = [], [], 0
+    for item in items:
+        cost = cost_fn(item)
+        if current and (current_cost + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_cost = [], 0
+        current.append(item)
+        current_cost += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def strip_json_fences(text):
+    """Removes ```json ... ``` markdown fences the model sometimes wraps around JSON."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def _match_allowed(value, allowed):
+    """Case-insensitive match of value against an allowed list; returns the canonical spelling or None."""
+    if not isinstance(value, str):
+        return None
+    for option in allowed:
+        if option.lower() == value.strip().lower():
+            return option
+    return None
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, cache=None):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables.")
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('models/gemini-2.0-flash') # Updated model
+        self.model_name = 'models/gemini-2.0-flash'
+        self.model = genai.GenerativeModel(self.model_name) # Updated model
+        # Persistent response cache (shared by all LLMService instances unless one is injected)
+        if cache is None and get_setting('llm_cache', 'enabled', True):
+            cache = get_shared_cache()
+        self.cache = cache
+        self.limiter = get_limiter("gemini")
+
+    def _cache_key(self, prompt_kind, input_text):
+        return self.cache.make_key(PROMPT_VERSIONS[prompt_kind], self.model_name, input_text)
+
+    # --- RATE-LIMITED GENERATION ---
+    def _retry_hint(self, error):
+        """
+        Classifies a Gemini error: (rate_limited, transient, retry_after_seconds). Both kinds are
+        retried; a 'retry_delay { seconds: N }' hint in a quota error is honored when present.
+        """
+        code = getattr(error, 'code', None)
+        code = getattr(code, 'value', code) # grpc StatusCode vs. HTTP int
+        name = type(error).__name__
+        rate_limited = code == 429 or name in ("ResourceExhausted", "TooManyRequests")
+        transient = code in (500, 502, 503, 504) or name in ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded")
+        match = re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', str(error))
+        return rate_limited, transient, float(match.group(1)) if match else None
+
+    def generate_content(self, prompt):
+        """
+        model.generate_content paced by the shared Gemini limiter. Generation is idempotent,
+        so quota and transient errors are retried with backoff; the last error is re-raised.
+        """
+        for attempt in range(self.limiter.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.model.generate_content(prompt)
+                self.limiter.on_success()
+                return response
+            except Exception as e:
+                rate_limited, transient, retry_after = self._retry_hint(e)
+                if rate_limited:
+                    self.limiter.on_rate_limited(retry_after)
+                if not (rate_limited or transient) or attempt == self.limiter.max_retries:
+                    self.limiter.record_failure()
+                    raise
+                print(f"  [LLM] {type(e).__name__}, retrying (attempt {attempt + 1}/{self.limiter.max_retries})...")
+                self.limiter.sleep_before_retry(attempt, retry_after)
 
     def analyze_comment(self, comment_text):
         """Analyzes a developer's comment for sentiment and blockers."""
@@ -19,12 +121,22 @@ class LLMService:
 
         Comment: "{comment_text}"
         """
+        cache_key = self._cache_key("comment", comment_text) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            response = self.generate_content(prompt)
+            analysis = response.text.strip()
         except Exception as e:
             return f"Error analyzing comment: {e}"
 
+        if cache_key:
+            self.cache.put(cache_key, analysis)
+        return analysis
+
     # --- NEW METHOD FIXED ---
     def analyze_triage(self, issue_summary, issue_description):
         """Analyzes a new ticket for type, severity, and required specialization."""
@@ -48,15 +160,282 @@ class LLMService:
             "specialization": "Frontend"
         }}
         """
+        cache_key = self._cache_key("triage", f"{issue_summary}\n{issue_description}") if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            response = self.model.generate_content(prompt)
+            response = self.generate_content(prompt)
             json_text = response.text.strip()
             # Clean up potential markdown formatting from LLM
             if json_text.startswith("```json"):
                 json_text = json_text.strip("```json").strip()
             if json_text.endswith("```"):
                 json_text = json_text.rstrip("```").strip()
-                
-            return json_text
         except Exception as e:
-            return f"Error analyzing triage: {e}"
\ No newline at end of file
+            return f"Error analyzing triage: {e}"
+
+        # Only well-formed answers are cached, so a bad response gets retried next run
+        if cache_key:
+            try:
+                json.loads(json_text)
+                self.cache.put(cache_key, json_text)
+            except json.JSONDecodeError:
+                pass
+        return json_text
+
+    # --- BATCH PLUMBING ---
+    def _run_single_batch(self, prompt, batch, key_field, validator, label):
+        """
+        Sends one packed prompt and parses the JSON array answer. Returns {key: validated_entry}
+        for the entries that name an item of the batch and pass the validator.
+        """
+        try:
+            response = self.generate_content(prompt)
+            entries = json.loads(strip_json_fences(response.text))
+        except Exception as e:
+            print(f"  [LLM] Batch {label} of {len(batch)} items failed: {e}")
+            return {}
+
+        if not isinstance(entries, list):
+            return {}
+        wanted = {item[key_field] for item in batch}
+        valid = {}
+        for entry in entries:
+            key = entry.get(key_field) if isinstance(entry, dict) else None
+            validated = validator(entry)
+            if key in wanted and validated:
+                valid[key] = validated
+        return valid
+
+    def _run_batched(self, pending, results, prompt_fn, validator, cost_fn, token_budget, max_batch_size, max_workers, max_retries, label, key_field="key"):
+        """
+        Packs pending items into batches, sends prompt_fn(batch) for each (concurrently when allowed),
+        stores the entries accepted by validator into results (and the cache), and retries only the failed items.
+        """
+        batch_fn = lambda batch: self._run_single_batch(prompt_fn(batch), batch, key_field, validator, label)
+        attempt = 0
+        while pending and attempt <= max_retries:
+            batches = pack_batches(pending, cost_fn, token_budget, max_batch_size)
+            print(f"  [LLM] Batch {label}: {len(pending)} items in {len(batches)} request(s) (attempt {attempt + 1}).")
+            if max_workers > 1 and len(batches) > 1:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    outputs = list(executor.map(batch_fn, batches))
+            else:
+                outputs = [batch_fn(batch) for batch in batches]
+
+            failed = []
+            for batch, valid in zip(batches, outputs):
+                for item in batch:
+                    entry = valid.get(item[key_field])
+                    if entry is None:
+                        failed.append(item)
+                        continue
+                    results[item[key_field]] = entry
+                    if self.cache:
+                        self.cache.put(item["cache_key"], json.dumps(entry))
+            pending = failed
+            attempt += 1
+
+        if pending:
+            print(f"  [LLM] Batch {label} gave up on {len(pending)} item(s): {', '.join(i[key_field] for i in pending)}")
+
+    # --- BATCH TRIAGE ---
+    def _validate_triage_entry(self, entry):
+        """Returns a normalized triage dict, or None if any field is missing or not allowed."""
+        if not isinstance(entry, dict):
+            return None
+        validated = {
+            "issue_type": _match_allowed(entry.get("issue_type"), TRIAGE_ISSUE_TYPES),
+            "priority": _match_allowed(entry.get("priority"), TRIAGE_PRIORITIES),
+            "specialization": _match_allowed(entry.get("specialization"), TRIAGE_SPECIALIZATIONS),
+        }
+        return validated if all(validated.values()) else None
+
+    def _triage_prompt(self, batch):
+        """Packed prompt for a batch of tickets to triage."""
+        tickets_json = json.dumps(
+            [{"key": t["key"], "summary": t["summary"], "description": t["description"]} for t in batch],
+            ensure_ascii=False, indent=1
+        )
+        prompt = f"""
+        You are an expert JIRA Triage Agent. Analyze EACH of the following new tickets.
+
+        Tickets (JSON):
+        {tickets_json}
+
+        For every ticket determine:
+        1.  **issue_type**: Must be one of: {', '.join(repr(v) for v in TRIAGE_ISSUE_TYPES)}.
+        2.  **priority**: Must be one of: {', '.join(repr(v) for v in TRIAGE_PRIORITIES)}.
+        3.  **specialization**: The required technical skill. Must be one of: {', '.join(repr(v) for v in TRIAGE_SPECIALIZATIONS)}.
+
+        Provide ONLY a JSON array with exactly one object per ticket, keyed by the ticket "key".
+
+        Example Output:
+        [
+            {{"key": "PROJ-1", "issue_type": "Story", "priority": "High", "specialization": "Frontend"}}
+        ]
+        """
+        return prompt
+
+    def analyze_triage_batch(self, tickets, max_workers=1, max_retries=2):
+        """
+        Triages many tickets with as few LLM calls as possible.
+        tickets: [{"key", "summary", "description"}]. Tickets are packed into prompts by a
+        token budget, answers are validated per entry, and only failed entries are retried.
+        Returns {issue_key: {"issue_type", "priority", "specialization"}}; keys that still
+        fail after max_retries are absent.
+        """
+        token_budget = get_setting('llm', 'triage_batch_token_budget', 6000)
+        max_batch_size = get_setting('llm', 'triage_max_batch_size', 25)
+        max_description_chars = get_setting('llm', 'max_description_chars', 2000)
+
+        results = {}
+        pending = []
+        for ticket in tickets:
+            ticket = dict(ticket, description=str(ticket.get("description") or "")[:max_description_chars])
+            if self.cache:
+                ticket["cache_key"] = self._cache_key("triage_batch", f"{ticket['summary']}\n{ticket['description']}")
+                cached = self.cache.get(ticket["cache_key"])
+                if cached is not None:
+                    results[ticket["key"]] = json.loads(cached)
+                    continue
+            pending.append(ticket)
+
+        cost_fn = lambda t: estimate_tokens(t["summary"]) + estimate_tokens(t["description"]) + 20
+        self._run_batched(pending, results, self._triage_prompt, self._validate_triage_entry, cost_fn,
+                          token_budget, max_batch_size, max_workers, max_retries, label="triage")
+        return results
+
+    # --- BATCH COMMENT ANALYSIS ---
+    def _validate_comment_entry(self, entry):
+        """Returns {"sentiment", "blocked", "confidence"}, or None if the entry is malformed."""
+        if not isinstance(entry, dict):
+            return None
+        sentiment = _match_allowed(entry.get("sentiment"), COMMENT_SENTIMENTS)
+        blocked = entry.get("blocked")
+        if isinstance(blocked, str) and blocked.strip().lower() in ("yes", "no", "true", "false"):
+            blocked = blocked.strip().lower() in ("yes", "true")
+        try:
+            confidence = float(entry.get("confidence"))
+        except (TypeError, ValueError):
+            return None
+        if sentiment is None or not isinstance(blocked, bool) or not 0.0 <= confidence <= 1.0:
+            return None
+        return {"sentiment": sentiment, "blocked": blocked, "confidence": confidence}
+
+    def _comment_prompt(self, batch):
+        """Packed prompt for a batch of comments to score."""
+        comments_json = json.dumps([{"key": c["key"], "comment": c["text"]} for c in batch], ensure_ascii=False, indent=1)
+        prompt = f"""
+        Analyze EACH of the following developer comments from Jira tickets.
+        For every comment determine the sentiment, whether the developer is blocked,
+        and how confident you are in that judgement.
+
+        Comments (JSON):
+        {comments_json}
+
+        Provide ONLY a JSON array with exactly one object per comment, keyed by the ticket "key":
+        - "sentiment": one of {', '.join(repr(v) for v in COMMENT_SENTIMENTS)}
+        - "blocked": true or false
+        - "confidence": a number between 0 and 1
+
+        Example Output:
+        [
+            {{"key": "PROJ-1", "sentiment": "Negative", "blocked": true, "confidence": 0.9}}
+        ]
+        """
+        return prompt
+
+    def analyze_comments_batch(self, comments, max_workers=1, max_retries=2):
+        """
+        Scores many developer comments in as few LLM calls as possible.
+        comments: [{"key", "text"}] (one latest comment per issue).
+        Returns {issue_key: {"sentiment", "blocked", "confidence"}}; keys that still
+        fail after max_retries are absent.
+        """
+        token_budget = get_setting('llm', 'comment_batch_token_budget', 6000)
+        max_batch_size = get_setting('llm', 'comment_max_batch_size', 40)
+        max_comment_chars = get_setting('llm', 'max_comment_chars', 2000)
+
+        results = {}
+        pending = []
+        for comment in comments:
+            comment = dict(comment, text=comment["text"][:max_comment_chars])
+            if self.cache:
+                comment["cache_key"] = self._cache_key("comment_batch", comment["text"])
+                cached = self.cache.get(comment["cache_key"])
+                if cached is not None:
+                    results[comment["key"]] = json.loads(cached)
+                    continue
+            pending.append(comment)
+
+        cost_fn = lambda c: estimate_tokens(c["text"]) + 15
+        self._run_batched(pending, results, self._comment_prompt, self._validate_comment_entry, cost_fn,
+                          token_budget, max_batch_size, max_workers, max_retries, label="comment analysis")
+        return results
+
+    # --- BATCH RELEASE-NOTE CATEGORIZATION ---
+    def _validate_release_entry(self, entry):
+        """Returns {"category", "note"}, or None if the category is not allowed or the note is empty."""
+        if not isinstance(entry, dict):
+            return None
+        category = _match_allowed(entry.get("category"), RELEASE_CATEGORIES)
+        note = entry.get("note")
+        if category is None or not isinstance(note, str) or not note.strip():
+            return None
+        return {"category": category, "note": " ".join(note.split())[:300]}
+
+    def _release_prompt(self, batch):
+        """Packed prompt for a batch of completed tickets to categorize."""
+        tickets_json = json.dumps(
+            [{"key": t["key"], "summary": t["summary"], "issue_type": t.get("issue_type")} for t in batch],
+            ensure_ascii=False, indent=1
+        )
+        prompt = f"""
+        You are a Technical Writer for a software team, preparing release notes.
+        For EACH of the following completed JIRA tickets, choose a category and write one
+        short, user-facing release-note sentence (no ticket key, no markdown).
+
+        Tickets (JSON):
+        {tickets_json}
+
+        Provide ONLY a JSON array with exactly one object per ticket, keyed by the ticket "key":
+        - "category": one of {', '.join(repr(v) for v in RELEASE_CATEGORIES)} ('Internal' for work that is not user-facing)
+        - "note": the release-note sentence
+
+        Example Output:
+        [
+            {{"key": "PROJ-1", "category": "Feature", "note": "Dark mode is now available from the settings menu."}}
+        ]
+        """
+        return prompt
+
+    def categorize_release_batch(self, tickets, max_workers=1, max_retries=2):
+        """
+        Categorizes completed tickets for the release notes in as few LLM calls as possible.
+        tickets: [{"key", "summary", "issue_type"}]. Cached per ticket, so only tickets that were
+        not categorized on an earlier run reach the LLM.
+        Returns {issue_key: {"category", "note"}}; keys that still fail after max_retries are absent.
+        """
+        token_budget = get_setting('llm', 'release_batch_token_budget', 6000)
+        max_batch_size = get_setting('llm', 'release_max_batch_size', 50)
+
+        results = {}
+        pending = []
+        for ticket in tickets:
+            ticket = dict(ticket)
+            if self.cache:
+                ticket["cache_key"] = self._cache_key("release_batch", f"{ticket['key']}\n{ticket['summary']}\n{ticket.get('issue_type')}")
+                cached = self.cache.get(ticket["cache_key"])
+                if cached is not None:
+                    results[ticket["key"]] = json.loads(cached)
+                    continue
+            pending.append(ticket)
+
+        cost_fn = lambda t: estimate_tokens(t["summary"]) + 40
+        self._run_batched(pending, results, self._release_prompt, self._validate_release_entry, cost_fn,
+                          token_budget, max_batch_size, max_workers, max_retries, label="release categorization")
+        return results
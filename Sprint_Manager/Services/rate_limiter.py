@@ -0,0 +1,127 @@
+# Sprint_Manager/Services/rate_limiter.py
+import random
+import threading
+import time
+from ..config import get_setting
+
+class RateLimiter:
+    """
+    An adaptive token bucket for one backend (Jira, Gemini, ...).
+    Every call takes a token before it is sent. A 429 / Retry-After pauses the whole
+    bucket and halves its rate; successes creep it back up to the configured ceiling
+    (AIMD), so sustained throughput settles just under the real quota.
+    """
+
+    def __init__(self, name, requests_per_minute, burst=None, min_requests_per_minute=None,
+                 max_retries=4, base_backoff_seconds=1.0, max_backoff_seconds=60.0):
+        self.name = name
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = (min_requests_per_minute or max(1, requests_per_minute // 20)) / 60.0
+        self.rate = self.max_rate
+        self.burst = burst or max(1, int(requests_per_minute // 60) * 2)
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled_seconds": 0.0, "rate_limited": 0, "retries": 0, "failures": 0}
+
+    # --- BUCKET ---
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Blocks until a request may be sent. Returns the seconds spent waiting."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve the token now (the balance may go negative) and sleep outside the lock
+            self._tokens -= 1
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            self.stats["requests"] += 1
+            self.stats["throttled_seconds"] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    # --- ADAPTATION ---
+    def on_success(self):
+        """Additive increase back towards the configured ceiling."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+    def on_near_limit(self):
+        """The backend says the budget is running low: ease off before it starts rejecting."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.8)
+
+    def on_rate_limited(self, retry_after=None):
+        """Multiplicative decrease, and pause every caller until the backend's Retry-After has passed."""
+        with self._lock:
+            self.stats["rate_limited"] += 1
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def backoff_seconds(self, attempt, retry_after=None):
+        """Retry delay: the server's Retry-After when given, else exponential backoff with jitter."""
+        if retry_after:
+            return retry_after
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def sleep_before_retry(self, attempt, retry_after=None):
+        delay = self.backoff_seconds(attempt, retry_after)
+        with self._lock:
+            self.stats["retries"] += 1
+            self.stats["throttled_seconds"] += delay
+        time.sleep(delay)
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, requests_per_minute=round(self.rate * 60, 1))
+
+def parse_retry_after(value):
+    """Retry-After as seconds (Jira sends delta-seconds). Returns None if absent or unparseable."""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+# --- SHARED LIMITERS ---
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+_DEFAULT_LIMITS = {
+    "jira": {"requests_per_minute": 600},
+    "gemini": {"requests_per_minute": 60},
+}
+
+def get_limiter(name):
+    """Returns the process-wide limiter for a backend, configured from the 'rate_limits' settings."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            options = dict(_DEFAULT_LIMITS.get(name, {"requests_per_minute": 60}))
+            options.update(get_setting('rate_limits', name, {}) or {})
+            limiter = RateLimiter(name, **options)
+            _limiters[name] = limiter
+        return limiter
+
+def get_all_limiter_stats():
+    """{backend: stats} for every limiter used so far."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
@@ -0,0 +1,153 @@
+# Sprint_Manager/adf.py
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from .config import get_setting
+
+# Nodes that end their line (lists need nothing extra: each item's own blocks end theirs)
+BLOCK_NODES = {
+    "doc", "paragraph", "heading", "blockquote", "panel", "expand", "nestedExpand", "taskItem",
+    "decisionItem", "table", "mediaSingle", "mediaGroup", "layoutSection", "layoutColumn",
+    "blockCard", "embedCard", "extension", "bodiedExtension",
+}
+LIST_NODES = {"bulletList", "orderedList", "taskList", "decisionList"}
+ITEM_NODES = {"listItem", "taskItem", "decisionItem"}
+MAX_INDENT_LEVELS = 8
+
+_EXTRA_BLANK_LINES = re.compile(r"\n{3,}")
+
+def _inline_text(node):
+    """Text of a leaf node (None if the node has children to walk instead)."""
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
+    if node_type == "text":
+        return node.get("text", "")
+    if node_type == "hardBreak":
+        return "\n"
+    if node_type == "rule":
+        return "\n---\n"
+    if node_type == "mention":
+        text = attrs.get("text") or attrs.get("id", "")
+        return text if text.startswith("@") else f"@{text}"
+    if node_type == "emoji":
+        return attrs.get("text") or attrs.get("shortName", "")
+    if node_type in ("inlineCard", "blockCard", "embedCard"):
+        return attrs.get("url") or (attrs.get("data") or {}).get("url", "")
+    if node_type == "status":
+        return f"[{attrs.get('text', '')}]"
+    if node_type == "date":
+        try:
+            return datetime.fromtimestamp(int(attrs.get("timestamp")) / 1000, tz=timezone.utc).date().isoformat()
+        except (TypeError, ValueError):
+            return ""
+    if node_type == "media":
+        return f"[{attrs.get('alt') or 'attachment'}]"
+    if node_type == "placeholder":
+        return attrs.get("text", "")
+    return None
+
+def adf_to_text(document, max_chars=None):
+    """
+    Converts an Atlassian Document Format node (or a plain string) to readable text in one
+    iterative depth-first pass, covering lists, tables, code blocks, panels, mentions, cards and
+    other node types. With max_chars the walk stops as soon as enough text has been produced,
+    so huge documents are never fully materialized.
+    """
+    if not document:
+        return ""
+    if isinstance(document, str):
+        return document[:max_chars] if max_chars else document
+    if not isinstance(document, dict):
+        return str(document)[:max_chars] if max_chars else str(document)
+
+    parts, length = [], 0
+    # Entries are (ADF node or a literal string queued to close a node, list depth, inside a table cell)
+    stack = [(document, 0, False)]
+    while stack:
+        node, depth, in_cell = stack.pop()
+        if isinstance(node, str):
+            text = node
+        else:
+            text = _inline_text(node)
+            if text is None:
+                text = ""
+                node_type = node.get("type")
+                children = node.get("content") or []
+                child_depth = depth + 1 if node_type in LIST_NODES else depth
+                child_in_cell = in_cell or node_type in ("tableCell", "tableHeader")
+                # Blocks end their line; inside a table cell they only need a space
+                if node_type in BLOCK_NODES:
+                    stack.append((" " if in_cell else "\n", depth, in_cell))
+                elif node_type == "codeBlock":
+                    stack.append(("\n```\n", depth, in_cell))
+                    text = f"```{(node.get('attrs') or {}).get('language') or ''}\n"
+                elif node_type == "tableRow":
+                    stack.append(("\n", depth, in_cell))
+                elif node_type in ("tableCell", "tableHeader"):
+                    stack.append((" | ", depth, in_cell))
+                if node_type == "orderedList":
+                    start = (node.get("attrs") or {}).get("order", 1)
+                    markers = [f"{start + i}. " for i in range(len(children))]
+                elif node_type == "taskList":
+                    markers = ["[x] " if (c.get("attrs") or {}).get("state") == "DONE" else "[ ] " for c in children]
+                elif node_type in LIST_NODES:
+                    markers = ["- "] * len(children)
+                else:
+                    markers = None
+                for index in range(len(children) - 1, -1, -1):
+                    child = children[index]
+                    if not isinstance(child, dict):
+                        continue
+                    stack.append((child, child_depth, child_in_cell))
+                    if markers and child.get("type") in ITEM_NODES:
+                        stack.append(("  " * min(child_depth - 1, MAX_INDENT_LEVELS) + markers[index], child_depth, child_in_cell))
+        if text:
+            parts.append(text)
+            length += len(text)
+            if max_chars and length >= max_chars:
+                break
+
+    text = _EXTRA_BLANK_LINES.sub("\n\n", "".join(parts)).strip()
+    return text[:max_chars] if max_chars else text
+
+class ADFTextCache:
+    """
+    Thread-safe LRU of extracted texts keyed by (item key, version), e.g. (issue key, 'updated')
+    or (comment id, 'updated'), so unchanged documents are not walked again on the next run.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or get_setting('adf', 'cache_size', 4096)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def text(self, key, version, document, max_chars=None):
+        """Extracted text for a document; without a version the result is not cached."""
+        if version is None:
+            return adf_to_text(document, max_chars)
+        cache_key = (key, version, max_chars)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            self.misses += 1
+        text = adf_to_text(document, max_chars)
+        with self._lock:
+            self._entries[cache_key] = text
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return text
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_shared_text_cache():
+    """The process-wide extraction cache shared by every agent."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ADFTextCache()
+        return _shared_cache
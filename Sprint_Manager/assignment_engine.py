@@ -0,0 +1,214 @@
+# Sprint_Manager/assignment_engine.py
+import heapq
+from .config import get_setting
+
+def solve_min_cost_assignment(cost):
+    """
+    Hungarian algorithm (shortest augmenting paths with potentials) for a rectangular
+    cost matrix with rows <= columns. Returns the chosen column for every row.
+    Infeasible cells should hold a large finite cost; callers filter them afterwards.
+    """
+    n, m = len(cost), len(cost[0]) if cost else 0
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    match = [0] * (m + 1)  # match[column] = row (1-based), 0 = free
+    way = [0] * (m + 1)
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_to = [float('inf')] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[column] = True
+            current_row, delta, next_column = match[column], float('inf'), 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                reduced = cost[current_row - 1][j - 1] - u[current_row] - v[j]
+                if reduced < min_to[j]:
+                    min_to[j], way[j] = reduced, column
+                if min_to[j] < delta:
+                    delta, next_column = min_to[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_to[j] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            assignment[match[j] - 1] = j - 1
+    return assignment
+
+class AssignmentEngine:
+    """
+    Assigns a whole triage batch of tickets to developers at once.
+    Profiles are loaded from the Knowledge Base once into per-specialization min-heaps
+    keyed by workload, so each pick is O(log n) instead of a query. Two strategies:
+      - 'greedy':  highest priority first, each ticket to the least-loaded specialist.
+      - 'optimal': min-cost matching over the batch, where a ticket's cost is its priority
+                   weight x developer load, so urgent work lands on the least-loaded specialists.
+                   Batches larger than max_optimal_batch are solved in priority-ordered chunks.
+    Both route a ticket to the fallback specialization only when its specialization has no
+    developers, or every specialist already holds specialist_load_cap tickets (if set).
+    Decisions are written back to the KB in one transaction.
+    """
+
+    def __init__(self, kb, strategy=None):
+        self.kb = kb
+        self.strategy = strategy or get_setting('assignment', 'strategy', 'optimal')
+        self.fallback_specialization = get_setting('assignment', 'fallback_specialization', 'FullStack')
+        self.specialist_load_cap = get_setting('assignment', 'specialist_load_cap', None)
+        self.max_optimal_batch = get_setting('assignment', 'max_optimal_batch', 50)
+        self.priority_weights = get_setting('assignment', 'priority_weights', {"High": 3, "Medium": 2, "Low": 1})
+        self.developers = {}  # developer_id -> {"name", "specialization", "workload"}
+        self.heaps = {}       # specialization -> [(workload, developer_id)]
+
+    def load(self):
+        """Reads every developer profile once and builds the workload heaps."""
+        self.developers, self.heaps = {}, {}
+        for developer_id, name, specialization, workload in self.kb.get_developer_profiles():
+            self.developers[developer_id] = {"name": name, "specialization": specialization, "workload": workload or 0}
+            self.heaps.setdefault(specialization, []).append((workload or 0, developer_id))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+        return self
+
+    # --- HEAP HELPERS ---
+    def _pop_least_loaded(self, specialization):
+        """Pops the least-loaded developer of a specialization, skipping stale heap entries."""
+        heap = self.heaps.get(specialization)
+        while heap:
+            workload, developer_id = heapq.heappop(heap)
+            if self.developers[developer_id]["workload"] == workload:
+                return developer_id
+        return None
+
+    def _reserve(self, developer_id):
+        """Adds one ticket to a developer and re-pushes them with the new workload."""
+        developer = self.developers[developer_id]
+        developer["workload"] += 1
+        heapq.heappush(self.heaps[developer["specialization"]], (developer["workload"], developer_id))
+
+    def _under_cap(self, load):
+        return self.specialist_load_cap is None or load < self.specialist_load_cap
+
+    def _sorted_tickets(self, tickets):
+        """Highest priority first; ties keep a stable, key-based order."""
+        return sorted(tickets, key=lambda t: (-self.priority_weights.get(t.get("priority"), 1), t["key"]))
+
+    # --- STRATEGIES ---
+    def _assign_greedy(self, tickets):
+        decisions = {}
+        for ticket in self._sorted_tickets(tickets):
+            group = ticket["specialization"]
+            developer_id = self._pop_least_loaded(group)
+            if developer_id is not None and not self._under_cap(self.developers[developer_id]["workload"]):
+                # Every specialist is at the cap; leave them on the heap and fall back
+                heapq.heappush(self.heaps[group], (self.developers[developer_id]["workload"], developer_id))
+                developer_id = None
+            if developer_id is None:
+                group = self.fallback_specialization
+                developer_id = self._pop_least_loaded(group)
+            if developer_id is None:
+                continue
+            if group != ticket["specialization"]:
+                print(f"  [Assign] No specific '{ticket['specialization']}' dev available (none, or all at the load cap). Fallback to {group}.")
+            developer = self.developers[developer_id]
+            decisions[ticket["key"]] = (developer_id, developer["name"], developer["workload"])
+            self._reserve(developer_id)
+        return decisions
+
+    def _slots(self, group, count, capped=False):
+        """
+        The `count` cheapest developer "slots" of a specialization: taking a developer's k-th
+        ticket in this batch costs their load + k. They can only come from the `count` least
+        loaded developers, so those are read off the heap without mutating it. With capped,
+        no slot takes a developer to the specialist load cap.
+        """
+        valid = (entry for entry in self.heaps.get(group, []) if self.developers[entry[1]]["workload"] == entry[0])
+        candidates = heapq.nsmallest(count, valid)
+        slots = []
+        while candidates and len(slots) < count:
+            load, developer_id = heapq.heappop(candidates)
+            if capped and not self._under_cap(load):
+                break
+            slots.append((load, developer_id))
+            heapq.heappush(candidates, (load + 1, developer_id))
+        return slots
+
+    def _match(self, tickets, group_of, capped):
+        """One min-cost matching of tickets onto the slots of group_of(ticket). Returns [(developer_id, ticket)]."""
+        groups = sorted({group_of(t) for t in tickets})
+        columns = [(group, load, developer_id) for group in groups for load, developer_id in self._slots(group, len(tickets), capped)]
+        if not columns:
+            return []
+
+        big = 1e9 # Stands in for "not allowed"; the solver needs finite costs
+        cost = []
+        for ticket in tickets:
+            weight = self.priority_weights.get(ticket.get("priority"), 1)
+            # Leaving a ticket out costs more the higher its priority, so overflow drops the least urgent
+            unassigned = big * weight
+            row = [weight * (load + 1) if group == group_of(ticket) else unassigned for group, load, _ in columns]
+            # Rows must not outnumber columns; surplus tickets get dummy, infeasible columns
+            row.extend([unassigned] * max(0, len(tickets) - len(columns)))
+            cost.append(row)
+
+        return [(columns[j][2], ticket) for row, (ticket, j) in enumerate(zip(tickets, solve_min_cost_assignment(cost)))
+                if j is not None and j < len(columns) and cost[row][j] < big]
+
+    def _assign_optimal(self, tickets):
+        decisions = {}
+        tickets = self._sorted_tickets(tickets)
+        # The solver is cubic; bound its matrix by solving priority-ordered chunks in turn
+        for start in range(0, len(tickets), self.max_optimal_batch):
+            decisions.update(self._assign_optimal_chunk(tickets[start:start + self.max_optimal_batch]))
+        return decisions
+
+    def _assign_optimal_chunk(self, tickets):
+        picks = self._match(tickets, lambda t: t["specialization"], capped=True)
+        assigned = {ticket["key"] for _, ticket in picks}
+        # Only tickets no specialist can take (none exist, or all are at the cap) reach the fallback
+        overflow = [t for t in tickets if t["key"] not in assigned]
+        if overflow:
+            picks += self._match(overflow, lambda t: self.fallback_specialization, capped=False)
+        # A developer's slots are interchangeable; hand them out in priority order
+        picks.sort(key=lambda pick: (pick[0], -self.priority_weights.get(pick[1].get("priority"), 1), pick[1]["key"]))
+
+        decisions = {}
+        for developer_id, ticket in picks:
+            developer = self.developers[developer_id]
+            if developer["specialization"] != ticket["specialization"]:
+                print(f"  [Assign] {ticket['key']}: '{ticket['specialization']}' routed to {developer['specialization']} dev {developer['name']}.")
+            decisions[ticket["key"]] = (developer_id, developer["name"], developer["workload"])
+            self._reserve(developer_id)
+        return decisions
+
+    def assign(self, tickets):
+        """
+        tickets: [{"key", "specialization", "priority"}]. Loads profiles on first use.
+        Returns {ticket_key: (developer_id, developer_name, workload_before)} for assignable tickets.
+        """
+        if not self.developers:
+            self.load()
+        if not tickets:
+            return {}
+        if self.strategy == 'greedy':
+            return self._assign_greedy(tickets)
+        return self._assign_optimal(tickets)
+
+    def commit(self, decisions):
+        """Writes the workload increments for a batch of decisions back to the KB in one transaction."""
+        deltas = {}
+        for developer_id, _, _ in decisions.values():
+            deltas[developer_id] = deltas.get(developer_id, 0) + 1
+        return self.kb.adjust_developer_workloads(deltas) if deltas else True
@@ -0,0 +1,32 @@
+# Sprint_Manager/config.py
+import json
+import os
+
+SETTINGS_PATH = os.path.join('Config', 'settings.json')
+
+_settings_cache = None
+
+def load_settings(path=SETTINGS_PATH):
+    """Loads Config/settings.json once. Missing or empty files yield an empty config."""
+    global _settings_cache
+    if _settings_cache is not None and path == SETTINGS_PATH:
+        return _settings_cache
+
+    settings = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            content = f.read().strip()
+            if content:
+                settings = json.loads(content)
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError as e:
+        print(f"  [Config] Could not parse {path}: {e}. Using defaults.")
+
+    if path == SETTINGS_PATH:
+        _settings_cache = settings
+    return settings
+
+def get_setting(section, key, default=None):
+    """Returns settings[section][key], or the default when it is not configured."""
+    return load_settings().get(section, {}).get(key, default)
@@ -0,0 +1,213 @@
+# Sprint_Manager/flow_analytics.py
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from .Services.jira_service import parse_jira_datetime
+from .config import get_setting
+
+def _utc(value):
+    """Jira timestamp -> UTC ISO string (sortable as text), or None."""
+    parsed = parse_jira_datetime(value)
+    return parsed.astimezone(timezone.utc).isoformat() if parsed else None
+
+def _seconds_between(start, end):
+    return max((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds(), 0.0)
+
+def _percentile(values, p):
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+def _days(seconds):
+    return f"{seconds / 86400:.1f}d" if seconds is not None else "n/a"
+
+class FlowAnalytics:
+    """
+    Cycle-time and bottleneck analytics from Jira issue changelogs.
+    Issues updated since the last sync are streamed with expand=changelog, and each issue's
+    status transitions are folded into a per-issue record (time spent in every status,
+    first active date, resolution date) stored in the Knowledge Base together with the last
+    changelog id applied. A re-run only applies transitions newer than that id, so the
+    cost of a sync is proportional to what changed, not to the size of the board.
+    """
+    WATERMARK = "FlowAnalytics"
+    FIELDS = ["created", "status", "updated"]
+
+    def __init__(self, jira_service, kb):
+        self.jira_service = jira_service
+        self.kb = kb
+        self.scope_jql = get_setting('flow', 'scope_jql', '')
+        self.initial_lookback_days = get_setting('flow', 'initial_lookback_days', 90)
+        self.active_statuses = set(get_setting('flow', 'active_statuses', ["In Progress", "In Review"]))
+        self.done_statuses = set(get_setting('flow', 'done_statuses', ["Done"]))
+        self.backlog_statuses = set(get_setting('flow', 'backlog_statuses', ["To Do", "Backlog"]))
+        self.min_sync_interval = get_setting('flow', 'min_sync_interval_seconds', 300)
+        self.batch_size = get_setting('flow', 'batch_size', 200)
+        self._lock = threading.Lock()
+        self._last_sync = None
+        self.stats = {"issues": 0, "transitions": 0, "changelog_fetches": 0}
+
+    # --- CHANGELOG FOLDING ---
+    def _new_flow(self, issue, histories):
+        """A fresh record starting at creation, in the status the first transition left (or the current one)."""
+        created = _utc(issue['fields'].get('created')) or datetime.now(timezone.utc).isoformat()
+        first = next((item for history in histories for item in history.get('items', []) if item.get('field') == 'status'), None)
+        status = first.get('fromString') if first else (issue['fields'].get('status') or {}).get('name')
+        return {
+            "issue_key": issue['key'], "created": created, "current_status": status, "status_since": created,
+            "first_active": created if status in self.active_statuses else None,
+            "resolved_at": created if status in self.done_statuses else None,
+            "last_changelog_id": 0, "status_seconds": {},
+        }
+
+    def _new_histories(self, issue, last_id):
+        """Changelog entries newer than last_id, oldest first; pages the full changelog only when the embedded one is cut short."""
+        changelog = issue.get('changelog') or {}
+        histories = changelog.get('histories', [])
+        ids = [int(history['id']) for history in histories]
+        if changelog.get('total', len(histories)) > len(histories) and (not ids or min(ids) > last_id):
+            histories = list(self.jira_service.iter_issue_changelog(issue['key']))
+            self.stats["changelog_fetches"] += 1
+        return sorted((h for h in histories if int(h['id']) > last_id), key=lambda h: int(h['id']))
+
+    def _apply(self, flow, histories):
+        """Folds status transitions into the record: time in the previous status, active/resolved dates."""
+        for history in histories:
+            changed_at = _utc(history.get('created'))
+            for item in history.get('items', []):
+                if item.get('field') != 'status' or not changed_at:
+                    continue
+                previous = flow["current_status"]
+                flow["status_seconds"][previous] = flow["status_seconds"].get(previous, 0.0) + _seconds_between(flow["status_since"], changed_at)
+                status = item.get('toString')
+                flow["current_status"], flow["status_since"] = status, changed_at
+                if status in self.active_statuses and not flow["first_active"]:
+                    flow["first_active"] = changed_at
+                # Reopened work is no longer resolved
+                flow["resolved_at"] = changed_at if status in self.done_statuses else None
+                self.stats["transitions"] += 1
+            flow["last_changelog_id"] = max(flow["last_changelog_id"], int(history['id']))
+        return flow
+
+    def _process_batch(self, issues):
+        known = self.kb.get_issue_flows(issue['key'] for issue in issues)
+        flows = []
+        for issue in issues:
+            flow = known.get(issue['key'])
+            histories = self._new_histories(issue, flow["last_changelog_id"] if flow else 0)
+            if flow is None:
+                flow = self._new_flow(issue, histories)
+            elif not histories:
+                continue
+            flows.append(self._apply(flow, histories))
+        if flows:
+            self.kb.upsert_issue_flows(flows)
+
+    # --- SYNC ---
+    def _sync_jql(self, watermark):
+        jql = self.jira_service.updated_since_clause(watermark) if watermark else None
+        jql = jql or f'updated >= -{self.initial_lookback_days}d'
+        return f'({self.scope_jql}) AND {jql}' if self.scope_jql else jql
+
+    def sync(self):
+        """Applies every changelog entry added since the last sync. Returns the sync stats."""
+        started = time.perf_counter()
+        self.stats = {"issues": 0, "transitions": 0, "changelog_fetches": 0}
+        watermark = self.kb.get_watermark(self.WATERMARK)
+        latest, latest_dt = watermark, parse_jira_datetime(watermark)
+
+        batch = []
+        for issue in self.jira_service.search_issues(self._sync_jql(watermark), self.FIELDS, expand="changelog"):
+            self.stats["issues"] += 1
+            batch.append(issue)
+            updated = issue['fields'].get('updated')
+            updated_dt = parse_jira_datetime(updated)
+            if updated_dt and (latest_dt is None or updated_dt > latest_dt):
+                latest, latest_dt = updated, updated_dt
+            if len(batch) >= self.batch_size:
+                self._process_batch(batch)
+                batch = []
+        if batch:
+            self._process_batch(batch)
+
+        if latest and latest != watermark:
+            self.kb.set_watermark(self.WATERMARK, latest)
+        self._last_sync = time.monotonic()
+        self.stats["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        print(f"  [Flow] Synced {self.stats['issues']} changed issue(s): {self.stats['transitions']} new transition(s), "
+              f"{self.stats['changelog_fetches']} full changelog fetch(es) in {self.stats['elapsed_ms']:.0f} ms.")
+        return self.stats
+
+    def refresh(self):
+        """Syncs unless another agent already did within min_sync_interval_seconds. Returns False if the sync failed."""
+        with self._lock:
+            if self._last_sync is not None and time.monotonic() - self._last_sync < self.min_sync_interval:
+                return True
+            try:
+                self.sync()
+                return True
+            except Exception as e:
+                print(f"  [Flow] Warning: changelog sync failed, using stored flow data: {e}")
+                return False
+
+    # --- METRICS ---
+    def metrics(self, window_days=None, issue_keys=None, now=None):
+        """
+        Flow metrics over open issues plus those resolved in the last window_days (or just issue_keys):
+        cycle/lead time percentiles (seconds), time per status, WIP, the bottleneck status and the
+        longest-waiting open issues. Time in an open issue's current status counts up to now.
+        """
+        now = now or datetime.now(timezone.utc)
+        window_days = window_days or get_setting('flow', 'window_days', 14)
+        if issue_keys is not None:
+            flows = self.kb.get_issue_flows(issue_keys).values()
+        else:
+            flows = self.kb.iter_issue_flows(resolved_since=(now - timedelta(days=window_days)).isoformat())
+
+        cycle_times, lead_times, ageing = [], [], []
+        status_totals, status_issues, wip = {}, {}, {}
+        for flow in flows:
+            seconds = dict(flow["status_seconds"])
+            if flow["resolved_at"] is None:
+                age = _seconds_between(flow["status_since"], now.isoformat())
+                seconds[flow["current_status"]] = seconds.get(flow["current_status"], 0.0) + age
+                if flow["current_status"] not in self.backlog_statuses:
+                    wip[flow["current_status"]] = wip.get(flow["current_status"], 0) + 1
+                    ageing.append((age, flow["issue_key"], flow["current_status"]))
+            else:
+                lead_times.append(_seconds_between(flow["created"], flow["resolved_at"]))
+                if flow["first_active"]:
+                    cycle_times.append(_seconds_between(flow["first_active"], flow["resolved_at"]))
+            for status, spent in seconds.items():
+                if status in self.done_statuses:
+                    continue
+                status_totals[status] = status_totals.get(status, 0.0) + spent
+                status_issues[status] = status_issues.get(status, 0) + 1
+
+        in_flow = {s: total for s, total in status_totals.items() if s not in self.backlog_statuses}
+        return {
+            "resolved": len(lead_times),
+            "cycle_time": {p: _percentile(cycle_times, p) for p in (50, 85)},
+            "lead_time": {p: _percentile(lead_times, p) for p in (50, 85)},
+            "time_in_status": sorted(((s, total, total / status_issues[s], status_issues[s]) for s, total in status_totals.items()),
+                                     key=lambda row: -row[1]),
+            "bottleneck": max(in_flow, key=in_flow.get) if in_flow else None,
+            "wip": wip,
+            "ageing": sorted(ageing, reverse=True),
+        }
+
+    def format_summary(self, metrics, top=3):
+        """Markdown lines for the cycle/lead time, the bottleneck and the oldest waiting work."""
+        lines = [f"- ⏱️ Cycle time P50 {_days(metrics['cycle_time'][50])} / P85 {_days(metrics['cycle_time'][85])} · "
+                 f"Lead time P50 {_days(metrics['lead_time'][50])} / P85 {_days(metrics['lead_time'][85])} "
+                 f"({metrics['resolved']} resolved)"]
+        if metrics["bottleneck"]:
+            status, total, average, issues = next(row for row in metrics["time_in_status"] if row[0] == metrics["bottleneck"])
+            lines.append(f"- 🚧 **Bottleneck: {status}** — {_days(total)} of accumulated wait across {issues} issue(s) "
+                         f"(avg {_days(average)}), {metrics['wip'].get(status, 0)} there now")
+        for age, issue_key, status in metrics["ageing"][:top]:
+            lines.append(f"  - {issue_key} has been in '{status}' for {_days(age)}")
+        return lines
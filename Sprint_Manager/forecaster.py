@@ -0,0 +1,67 @@
+# Sprint_Manager/forecaster.py
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from .config import get_setting
+
+class SprintForecaster:
+    """
+    Monte Carlo completion forecasts for a sprint.
+    Historical per-day throughput (issues completed per calendar day) is resampled into
+    tens of thousands of simulated futures at once: one NumPy matrix of
+    simulations x days, a cumulative sum, and a search for the day each run finishes.
+    """
+
+    def __init__(self, simulations=None, seed=None):
+        self.simulations = simulations or get_setting('forecast', 'simulations', 20000)
+        self.horizon_days = get_setting('forecast', 'horizon_days', 90)
+        self.rng = np.random.default_rng(seed if seed is not None else get_setting('forecast', 'seed'))
+
+    @staticmethod
+    def daily_rates_from_history(history):
+        """
+        Per-day throughput samples from sprint_history rows [(start_date, as_of_date, completed)]:
+        each sprint contributes its average daily rate.
+        """
+        rates = []
+        for start, as_of, completed in history:
+            try:
+                days = (datetime.fromisoformat(as_of[:10]) - datetime.fromisoformat(start[:10])).days
+            except (TypeError, ValueError):
+                continue
+            if days > 0 and completed is not None:
+                rates.append(completed / days)
+        return rates
+
+    def forecast(self, remaining, daily_samples, days_left, today=None):
+        """
+        Simulates finishing `remaining` issues by drawing one throughput sample per future day.
+        Returns None without samples; otherwise a dict with P50/P85/P95 days and dates,
+        the probability of finishing within days_left, and the elapsed milliseconds.
+        """
+        samples = np.asarray([s for s in daily_samples if s is not None and s >= 0], dtype=float)
+        if remaining <= 0:
+            return {"remaining": 0, "probability_on_time": 1.0, "percentiles": {}, "simulations": 0, "elapsed_ms": 0.0}
+        if samples.size == 0 or not samples.any():
+            return None
+
+        started = time.perf_counter()
+        horizon = max(int(np.ceil(days_left)) + 1, self.horizon_days)
+        draws = self.rng.choice(samples, size=(self.simulations, horizon))
+        progress = np.cumsum(draws, axis=1)
+        finished = progress[:, -1] >= remaining
+        # First day (1-based) each simulation reaches the remaining work; horizon + 1 = not within horizon
+        days_needed = np.where(finished, np.argmax(progress >= remaining, axis=1) + 1, horizon + 1)
+
+        today = today or datetime.now()
+        percentiles = {}
+        for p in (50, 85, 95):
+            days = int(np.percentile(days_needed, p, method="higher"))
+            percentiles[p] = {"days": days, "date": (today + timedelta(days=days)).date() if days <= horizon else None}
+        return {
+            "remaining": remaining,
+            "probability_on_time": float(np.mean(days_needed <= days_left)),
+            "percentiles": percentiles,
+            "simulations": self.simulations,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
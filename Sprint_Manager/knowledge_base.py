@@ -1,18 +1,77 @@
 # Sprint_Manager/knowledge_base.py
 import sqlite3
+import json
+import hashlib
+import threading
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
+from .config import get_setting
 
 class KnowledgeBase:
+    """
+    SQLite-backed storage for sprint history, developer profiles and agent state.
+    Every thread gets its own connection (WAL mode, so readers never block the writer);
+    writes go through _transaction(), which serializes writers and commits once per batch.
+    """
+
     def __init__(self, db_path='data/sprint_data.db'):
         """Initializes the connection to the SQLite database."""
         self.db_path = db_path
-        self.conn = None
-        self._connect()
+        self._local = threading.local()
+        self._connections = []              # (thread, connection) for every connection opened
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._uri = False
+        self._keepalive = None
+        if db_path == ':memory:':
+            # Per-thread connections need a named shared-cache database to see the same data
+            self.db_path, self._uri = f"file:kb_{id(self)}?mode=memory&cache=shared", True
+        self._keepalive = self._connect() # Owned by the creating thread; keeps in-memory DBs alive
         self._setup_database()
         print("Knowledge Base initialized and connected.")
 
     def _connect(self):
-        """Establishes the database connection."""
-        self.conn = sqlite3.connect(self.db_path)
+        """Opens (or returns) the calling thread's database connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(self.db_path, uri=self._uri, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        self._local.conn = conn
+        with self._connections_lock:
+            self._prune_connections()
+            self._connections.append((threading.current_thread(), conn))
+        return conn
+
+    def _prune_connections(self):
+        """Closes connections whose threads have exited (worker pools and scheduler ticks come and go)."""
+        alive = []
+        for thread, conn in self._connections:
+            if thread.is_alive() or conn is self._keepalive:
+                alive.append((thread, conn))
+            else:
+                conn.close()
+        self._connections = alive
+
+    @property
+    def conn(self):
+        """The calling thread's connection."""
+        return self._connect()
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction: one writer at a time, a single commit, rollback on error."""
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn.cursor()
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
 
     def _setup_database(self):
         """Creates the necessary tables if they don't already exist."""
@@ -28,6 +87,37 @@ class KnowledgeBase:
             )
         ''')
 
+        # Incremental runs: per-agent high-water mark of the last processed 'updated' timestamp
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS agent_watermarks (
+                agent_name TEXT PRIMARY KEY,
+                last_updated TEXT NOT NULL
+            )
+        ''')
+
+        # Per-agent results for each issue, reused while the issue's 'updated' is unchanged
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS agent_issue_results (
+                agent_name TEXT NOT NULL,
+                issue_key TEXT NOT NULL,
+                issue_updated TEXT,
+                result TEXT,
+                PRIMARY KEY (agent_name, issue_key)
+            )
+        ''')
+
+        # Autonomous actions already taken (comments, escalations), so they are not repeated within a cooldown
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS action_ledger (
+                issue_key TEXT NOT NULL,
+                action_type TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                performed_at TEXT NOT NULL,
+                PRIMARY KEY (issue_key, action_type, content_hash)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_action_ledger_performed_at ON action_ledger (performed_at)')
+
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS developer_profiles (
                 developer_id TEXT PRIMARY KEY,
@@ -53,14 +143,84 @@ class KnowledgeBase:
             ]
             cursor.executemany('INSERT INTO developer_profiles (developer_id, name, specialization, current_workload) VALUES (?, ?, ?, ?)', initial_devs)
         
+        # Sprint time series: one row per sprint, day and status. Past days are never rewritten;
+        # the current day's rows are refreshed until the day is over.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sprint_daily_snapshots (
+                sprint_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                status TEXT NOT NULL,
+                is_done INTEGER NOT NULL,
+                issue_count INTEGER NOT NULL,
+                points REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (sprint_id, day, status)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sprint_daily_snapshots_day ON sprint_daily_snapshots (day)')
+        # Weekly rollup: each status as of the last recorded day of the week (kept after daily rows are compacted)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sprint_weekly_rollups (
+                sprint_id INTEGER NOT NULL,
+                week_start TEXT NOT NULL,
+                status TEXT NOT NULL,
+                is_done INTEGER NOT NULL,
+                issue_count INTEGER NOT NULL,
+                points REAL NOT NULL DEFAULT 0,
+                as_of_day TEXT NOT NULL,
+                PRIMARY KEY (sprint_id, week_start, status)
+            ) WITHOUT ROWID
+        ''')
+        # Per-sprint rollup: span, peak scope and latest totals
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sprint_rollups (
+                sprint_id INTEGER PRIMARY KEY,
+                first_day TEXT NOT NULL,
+                last_day TEXT NOT NULL,
+                days_recorded INTEGER NOT NULL,
+                peak_issue_count INTEGER NOT NULL,
+                done_count INTEGER NOT NULL,
+                done_points REAL NOT NULL,
+                total_count INTEGER NOT NULL,
+                total_points REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sprint_rollups_last_day ON sprint_rollups (last_day)')
+
+        # Flow analytics: per-issue status timeline folded from the changelog, up to last_changelog_id
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS issue_flow (
+                issue_key TEXT PRIMARY KEY,
+                created TEXT NOT NULL,
+                current_status TEXT,
+                status_since TEXT NOT NULL,
+                first_active TEXT,
+                resolved_at TEXT,
+                last_changelog_id INTEGER NOT NULL DEFAULT 0,
+                status_seconds TEXT NOT NULL DEFAULT '{}'
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issue_flow_resolved_at ON issue_flow (resolved_at)')
+
+        # Migration: story points currently assigned, maintained by the workload sync
+        cursor.execute('PRAGMA table_info(developer_profiles)')
+        if 'current_points' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE developer_profiles ADD COLUMN current_points REAL DEFAULT 0')
+
+        # Covering indexes: assignee lookups and velocity history are answered from the index alone
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_developer_profiles_specialization ON developer_profiles (specialization, current_workload, developer_id, name)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sprint_history_end_date ON sprint_history (end_date, completed_points)')
+        
         self.conn.commit()
         print("Knowledge Base: Tables verified and ready.")
 
     def close(self):
-        """Closes the database connection."""
-        if self.conn:
-            self.conn.close()
-            print("Knowledge Base connection closed.")
+        """Closes every thread's database connection."""
+        with self._connections_lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+        print("Knowledge Base connection closed.")
 
     def get_best_assignee(self, specialization):
         """
@@ -85,14 +245,54 @@ class KnowledgeBase:
 
     def update_developer_workload(self, developer_id, new_workload):
         """Updates the current_workload for a given developer_id."""
+        return self.update_developer_workloads({developer_id: new_workload})
+
+    def update_developer_workloads(self, workloads):
+        """Sets current_workload for many developers ({developer_id: workload}) in one transaction."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('UPDATE developer_profiles SET current_workload = ? WHERE developer_id = ?', (new_workload, developer_id))
-            self.conn.commit()
+            with self._transaction() as cursor:
+                cursor.executemany('UPDATE developer_profiles SET current_workload = ? WHERE developer_id = ?',
+                                   [(workload, developer_id) for developer_id, workload in workloads.items()])
             return True
-        except Exception:
+        except sqlite3.Error:
             return False
 
+    def adjust_developer_workload(self, developer_id, delta):
+        """Atomically adds delta to a developer's current_workload (never below zero)."""
+        return self.adjust_developer_workloads({developer_id: delta})
+
+    def adjust_developer_workloads(self, deltas):
+        """Adds {developer_id: delta} to many developers' workloads (never below zero) in one transaction."""
+        try:
+            with self._transaction() as cursor:
+                cursor.executemany('UPDATE developer_profiles SET current_workload = MAX(current_workload + ?, 0) WHERE developer_id = ?',
+                                   [(delta, developer_id) for developer_id, delta in deltas.items()])
+            return True
+        except sqlite3.Error:
+            return False
+
+    def sync_developer_workloads(self, workloads):
+        """
+        Replaces every developer's workload with the authoritative {developer_id: (open_issues, story_points)}.
+        Developers missing from the mapping have nothing open and are reset to zero. One transaction.
+        Returns the number of profiles whose numbers changed.
+        """
+        with self._transaction() as cursor:
+            cursor.execute('SELECT developer_id, current_workload, current_points FROM developer_profiles')
+            changes = []
+            for developer_id, workload, points in cursor.fetchall():
+                new_workload, new_points = workloads.get(developer_id, (0, 0))
+                if (workload or 0, points or 0) != (new_workload, new_points):
+                    changes.append((new_workload, new_points, developer_id))
+            cursor.executemany('UPDATE developer_profiles SET current_workload = ?, current_points = ? WHERE developer_id = ?', changes)
+        return len(changes)
+
+    def upsert_developer_profiles(self, profiles):
+        """Inserts or replaces [(developer_id, name, specialization, current_workload)] in one transaction."""
+        with self._transaction() as cursor:
+            cursor.executemany('INSERT OR REPLACE INTO developer_profiles (developer_id, name, specialization, current_workload) VALUES (?, ?, ?, ?)',
+                               profiles)
+
     def get_average_velocity(self, last_n=3):
         """Calculates the average completed issues (velocity) from the last N sprints."""
         cursor = self.conn.cursor()
@@ -106,8 +306,220 @@ class KnowledgeBase:
         result = cursor.fetchone()
         return result[0] if result and result[0] is not None else 0
 
+    def record_sprint_health(self, sprint_id, completed_points, end_date=None, start_date=None):
+        """Stores (or refreshes) a sprint's completed count in sprint_history, as of end_date (default today)."""
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO sprint_history (sprint_id, start_date, end_date, completed_points) VALUES (?, ?, ?, ?)',
+                           (sprint_id, start_date, end_date or date.today().isoformat(), completed_points))
+
+    def get_sprint_history(self, last_n=10):
+        """The last N sprints with a known start: [(sprint_id, start_date, end_date, completed_points)], newest first."""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT sprint_id, start_date, end_date, completed_points FROM sprint_history
+            WHERE start_date IS NOT NULL
+            ORDER BY end_date DESC
+            LIMIT ?
+        ''', (last_n,))
+        return cursor.fetchall()
+
+    def get_developer_profiles(self):
+        """Fetches every profile with its specialization: [(id, name, specialization, workload), ...]."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT developer_id, name, specialization, current_workload FROM developer_profiles')
+        return cursor.fetchall()
+
     def get_all_developer_profiles(self):
         """Fetches all developer profiles to analyze workload balance."""
         cursor = self.conn.cursor()
         cursor.execute('SELECT developer_id, name, current_workload FROM developer_profiles')
-        return cursor.fetchall()
\ No newline at end of file
+        return cursor.fetchall()
+
+    # --- INCREMENTAL RUN STATE ---
+    def get_watermark(self, agent_name):
+        """Returns the last processed Jira 'updated' timestamp for an agent, or None on a first run."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT last_updated FROM agent_watermarks WHERE agent_name = ?', (agent_name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, agent_name, last_updated):
+        """Stores an agent's high-water mark."""
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO agent_watermarks (agent_name, last_updated) VALUES (?, ?)', (agent_name, last_updated))
+
+    def get_agent_results(self, agent_name):
+        """Returns {issue_key: {"updated": ..., "result": ...}} saved by an agent on previous runs."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT issue_key, issue_updated, result FROM agent_issue_results WHERE agent_name = ?', (agent_name,))
+        return {key: {"updated": updated, "result": json.loads(result) if result else None}
+                for key, updated, result in cursor.fetchall()}
+
+    def replace_agent_results(self, agent_name, results):
+        """Replaces an agent's saved results with {issue_key: (issue_updated, result)} in one transaction."""
+        with self._transaction() as cursor:
+            cursor.execute('DELETE FROM agent_issue_results WHERE agent_name = ?', (agent_name,))
+            cursor.executemany('INSERT INTO agent_issue_results (agent_name, issue_key, issue_updated, result) VALUES (?, ?, ?, ?)',
+                               [(agent_name, key, updated, json.dumps(result) if result is not None else None)
+                                for key, (updated, result) in results.items()])
+
+    # --- ACTION LEDGER ---
+    @staticmethod
+    def _content_hash(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def was_action_taken(self, issue_key, action_type, content, cooldown_hours):
+        """True if this exact action was performed on the issue within the last cooldown_hours (one primary-key lookup)."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT performed_at FROM action_ledger WHERE issue_key = ? AND action_type = ? AND content_hash = ?',
+                       (issue_key, action_type, self._content_hash(content)))
+        row = cursor.fetchone()
+        return bool(row) and datetime.fromisoformat(row[0]) > datetime.now() - timedelta(hours=cooldown_hours)
+
+    def record_actions(self, actions, retention_days=None):
+        """Records [(issue_key, action_type, content)] as performed now, and prunes entries older than retention_days."""
+        if retention_days is None:
+            retention_days = get_setting('action_ledger', 'retention_days', 30)
+        now = datetime.now()
+        with self._transaction() as cursor:
+            cursor.executemany('INSERT OR REPLACE INTO action_ledger (issue_key, action_type, content_hash, performed_at) VALUES (?, ?, ?, ?)',
+                               [(issue_key, action_type, self._content_hash(content), now.isoformat())
+                                for issue_key, action_type, content in actions])
+            cursor.execute('DELETE FROM action_ledger WHERE performed_at < ?', ((now - timedelta(days=retention_days)).isoformat(),))
+
+    # --- SPRINT TIME SERIES ---
+    def record_daily_snapshot(self, sprint_id, rows, day=None, retention_days=None):
+        """
+        Stores today's (or `day`'s) status breakdown [(status, is_done, issue_count, points)] for a sprint
+        and refreshes that week's and that sprint's rollups, all in one transaction. Daily rows older
+        than retention_days are then compacted away (their weekly rollups remain).
+        """
+        day = day or date.today().isoformat()
+        day_date = date.fromisoformat(day)
+        week_start = (day_date - timedelta(days=day_date.weekday())).isoformat()
+        if retention_days is None:
+            retention_days = get_setting('sprint_timeseries', 'daily_retention_days', 365)
+        total_count = sum(row[2] for row in rows)
+        total_points = sum(row[3] or 0 for row in rows)
+        done_count = sum(row[2] for row in rows if row[1])
+        done_points = sum(row[3] or 0 for row in rows if row[1])
+
+        cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+
+        with self._transaction() as cursor:
+            cursor.execute('SELECT 1 FROM sprint_daily_snapshots WHERE sprint_id = ? AND day = ? LIMIT 1', (sprint_id, day))
+            day_was_recorded = cursor.fetchone() is not None
+            # Daily: replace this day's rows (statuses that emptied out disappear)
+            cursor.execute('DELETE FROM sprint_daily_snapshots WHERE sprint_id = ? AND day = ?', (sprint_id, day))
+            cursor.executemany('INSERT INTO sprint_daily_snapshots (sprint_id, day, status, is_done, issue_count, points) VALUES (?, ?, ?, ?, ?, ?)',
+                               [(sprint_id, day, status, int(bool(is_done)), count, points or 0) for status, is_done, count, points in rows])
+
+            # Weekly: the latest day recorded in the week wins
+            cursor.execute('SELECT MAX(as_of_day) FROM sprint_weekly_rollups WHERE sprint_id = ? AND week_start = ?', (sprint_id, week_start))
+            latest = cursor.fetchone()[0]
+            if latest is None or latest <= day:
+                cursor.execute('DELETE FROM sprint_weekly_rollups WHERE sprint_id = ? AND week_start = ?', (sprint_id, week_start))
+                cursor.executemany('INSERT INTO sprint_weekly_rollups (sprint_id, week_start, status, is_done, issue_count, points, as_of_day) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   [(sprint_id, week_start, status, int(bool(is_done)), count, points or 0, day) for status, is_done, count, points in rows])
+
+            # Per sprint: merged incrementally, so it stays correct after compaction
+            cursor.execute('SELECT first_day, last_day, days_recorded, peak_issue_count FROM sprint_rollups WHERE sprint_id = ?', (sprint_id,))
+            existing = cursor.fetchone()
+            if existing is None:
+                rollup = (day, day, 1 if rows else 0, total_count)
+            else:
+                first_day, last_day, days_recorded, peak = existing
+                # A day counts once, whether it extends the range or fills a gap inside it; a day
+                # already compacted away can't be told apart from a gap and is assumed recorded
+                if day > last_day or day < first_day:
+                    new_day = bool(rows)
+                else:
+                    new_day = bool(rows) and not day_was_recorded and day >= cutoff
+                rollup = (min(first_day, day), max(last_day, day), days_recorded + (1 if new_day else 0), max(peak, total_count))
+            if existing is None or day >= existing[1]:
+                totals = (done_count, done_points, total_count, total_points)
+            else:
+                cursor.execute('SELECT done_count, done_points, total_count, total_points FROM sprint_rollups WHERE sprint_id = ?', (sprint_id,))
+                totals = cursor.fetchone()
+            cursor.execute('INSERT OR REPLACE INTO sprint_rollups (sprint_id, first_day, last_day, days_recorded, peak_issue_count, done_count, done_points, total_count, total_points) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (sprint_id, *rollup, *totals))
+
+            # Retention compaction
+            cursor.execute('DELETE FROM sprint_daily_snapshots WHERE day < ?', (cutoff,))
+
+    def get_burndown(self, sprint_id):
+        """
+        The sprint's burndown in one indexed read: [{"day", "total", "done", "remaining",
+        "total_points", "done_points", "remaining_points"}] per recorded day (per week once compacted).
+        """
+        cursor = self.conn.cursor()
+        query = '''
+            SELECT {day}, SUM(issue_count), SUM(issue_count * is_done), SUM(points), SUM(points * is_done)
+            FROM {table} WHERE sprint_id = ? GROUP BY {day} ORDER BY {day}
+        '''
+        cursor.execute(query.format(day='day', table='sprint_daily_snapshots'), (sprint_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            cursor.execute(query.format(day='week_start', table='sprint_weekly_rollups'), (sprint_id,))
+            rows = cursor.fetchall()
+        return [{"day": day, "total": total, "done": done, "remaining": total - done,
+                 "total_points": points, "done_points": done_points, "remaining_points": points - done_points}
+                for day, total, done, points, done_points in rows]
+
+    def get_sprint_rollups(self, last_n=10):
+        """The most recently active sprints' rollups, newest first."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT sprint_id, first_day, last_day, days_recorded, peak_issue_count, done_count, done_points, total_count, total_points '
+                       'FROM sprint_rollups ORDER BY last_day DESC LIMIT ?', (last_n,))
+        return cursor.fetchall()
+
+    def get_daily_throughput(self, last_n_sprints=10):
+        """
+        Issues completed per calendar day across recent sprints, from day-over-day changes in
+        the done count. A gap of several days is spread evenly over the days it covers.
+        """
+        samples = []
+        for sprint_id, *_ in self.get_sprint_rollups(last_n_sprints):
+            burndown = self.get_burndown(sprint_id)
+            for previous, current in zip(burndown, burndown[1:]):
+                gap = (date.fromisoformat(current["day"]) - date.fromisoformat(previous["day"])).days
+                if gap > 0:
+                    samples.extend([max(current["done"] - previous["done"], 0) / gap] * gap)
+        return samples
+
+    # --- FLOW ANALYTICS ---
+    FLOW_COLUMNS = ('issue_key', 'created', 'current_status', 'status_since', 'first_active', 'resolved_at', 'last_changelog_id', 'status_seconds')
+
+    def _flow_row(self, row):
+        flow = dict(zip(self.FLOW_COLUMNS, row))
+        flow['status_seconds'] = json.loads(flow['status_seconds'])
+        return flow
+
+    def get_issue_flows(self, issue_keys, chunk_size=500):
+        """{issue_key: flow} for the given keys, read with a few primary-key IN queries."""
+        issue_keys = list(issue_keys)
+        cursor = self.conn.cursor()
+        flows = {}
+        for i in range(0, len(issue_keys), chunk_size):
+            chunk = issue_keys[i:i + chunk_size]
+            cursor.execute(f"SELECT {', '.join(self.FLOW_COLUMNS)} FROM issue_flow WHERE issue_key IN ({','.join('?' * len(chunk))})", chunk)
+            for row in cursor.fetchall():
+                flows[row[0]] = self._flow_row(row)
+        return flows
+
+    def upsert_issue_flows(self, flows):
+        """Writes a batch of flow records in one transaction."""
+        with self._transaction() as cursor:
+            cursor.executemany(f"INSERT OR REPLACE INTO issue_flow ({', '.join(self.FLOW_COLUMNS)}) VALUES ({','.join('?' * len(self.FLOW_COLUMNS))})",
+                               [tuple(json.dumps(flow[c]) if c == 'status_seconds' else flow[c] for c in self.FLOW_COLUMNS) for flow in flows])
+
+    def iter_issue_flows(self, resolved_since=None):
+        """Streams open issues plus those resolved on/after resolved_since (all resolved issues when None)."""
+        cursor = self.conn.cursor()
+        query = f"SELECT {', '.join(self.FLOW_COLUMNS)} FROM issue_flow"
+        if resolved_since:
+            cursor.execute(query + " WHERE resolved_at IS NULL OR resolved_at >= ?", (resolved_since,))
+        else:
+            cursor.execute(query)
+        for row in cursor:
+            yield self._flow_row(row)
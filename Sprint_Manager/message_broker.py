@@ -1,21 +1,251 @@
-import queue
+# Sprint_Manager/message_broker.py
+import json
+import sqlite3
+import threading
+import time
+
+# Well-known topics
+TOPIC_AGENT_EVENTS = "agent.events"           # Default / general-purpose
+TOPIC_DEVELOPER_ALERTS = "developer.alerts"   # Blockers & stalled work from the Developer Assistant
+TOPIC_JIRA_WEBHOOK = "jira.webhook"           # Events ingested by the webhook server
+
+class _ConsumerState:
+    """Delivery bookkeeping for one consumer on one topic."""
+    def __init__(self, committed):
+        self.committed = committed  # Every offset below this is acknowledged
+        self.cursor = committed     # Next offset never delivered to this consumer
+        self.acked = set()          # Acknowledged offsets at or above 'committed' (out-of-order acks)
+        self.inflight = {}          # offset -> redelivery deadline
 
 class MessageBroker:
-    def __init__(self):
-        """Initializes a simple in-memory message queue."""
-        self.message_queue = queue.Queue()
-        print("Message Broker initialized.")
-
-    def publish(self, agent_name, message):
-        """An agent publishes a message to the queue."""
-        full_message = {"sender": agent_name, "content": message}
-        self.message_queue.put(full_message)
-        print(f"Message Broker: Received message from {agent_name}.")
-
-    def subscribe(self):
-        """Retrieves the next message from the queue for a listening agent."""
-        if not self.message_queue.empty():
-            message = self.message_queue.get()
-            print(f"Message Broker: Dispatching message -> {message['content']}")
-            return message
-        return None
\ No newline at end of file
+    """
+    A topic-based message broker with structured payloads.
+    Each topic is an append-only log; consumers track their own offsets, acknowledge
+    what they processed, and get unacknowledged messages redelivered after a timeout.
+    With a db_path the log and offsets are kept in SQLite (WAL), so nothing is lost on
+    a crash; without one everything stays in memory.
+
+    consumer_groups ({topic: [consumer, ...]}) declares up front who reads each topic: a
+    declared consumer holds its messages from the start, even if it first consumes later,
+    and a topic is truncated only below the lowest offset every declared consumer committed.
+    Topics without declared consumers keep their newest max_undeclared_messages.
+    """
+
+    def __init__(self, db_path=None, redelivery_seconds=30, consumer_groups=None, max_undeclared_messages=1000):
+        self.db_path = db_path
+        self.redelivery_seconds = redelivery_seconds
+        self.consumer_groups = {topic: set(consumers) for topic, consumers in (consumer_groups or {}).items() if consumers}
+        self.max_undeclared_messages = max_undeclared_messages
+        self._cond = threading.Condition(threading.RLock())
+        self._logs = {}         # topic -> list of messages (oldest retained first)
+        self._base_offset = {}  # topic -> offset of _logs[topic][0]
+        self._next_offset = {}  # topic -> offset the next publish will get
+        self._consumers = {}    # (topic, consumer) -> _ConsumerState
+        self.conn = None
+        if db_path:
+            self._open_durable_log()
+        with self._cond:
+            for topic, consumers in self.consumer_groups.items():
+                for consumer in consumers:
+                    self._consumer(topic, consumer)
+        print(f"Message Broker initialized ({'durable: ' + db_path if db_path else 'in-memory'}).")
+
+    # --- DURABLE LOG ---
+    def _open_durable_log(self):
+        """Opens the SQLite log and restores retained messages and consumer offsets."""
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS broker_messages (
+                topic TEXT NOT NULL,
+                msg_offset INTEGER NOT NULL,
+                sender TEXT,
+                content TEXT,
+                payload TEXT,
+                created_at REAL,
+                PRIMARY KEY (topic, msg_offset)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS broker_offsets (
+                topic TEXT NOT NULL,
+                consumer TEXT NOT NULL,
+                committed INTEGER NOT NULL,
+                PRIMARY KEY (topic, consumer)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+        for topic, consumer, committed in self.conn.execute('SELECT topic, consumer, committed FROM broker_offsets'):
+            self._consumers[(topic, consumer)] = _ConsumerState(committed)
+            self._next_offset[topic] = max(self._next_offset.get(topic, 0), committed)
+
+        rows = self.conn.execute('SELECT topic, msg_offset, sender, content, payload, created_at FROM broker_messages ORDER BY topic, msg_offset')
+        for topic, offset, sender, content, payload, created_at in rows:
+            log = self._logs.setdefault(topic, [])
+            if not log:
+                self._base_offset[topic] = offset
+            log.append(self._make_message(topic, offset, sender, content, json.loads(payload) if payload else None, created_at))
+            self._next_offset[topic] = max(self._next_offset.get(topic, 0), offset + 1)
+
+        # Consumers whose messages were dropped while they were away resume at the oldest retained one
+        for (topic, _), state in self._consumers.items():
+            start = self._base_offset.get(topic, self._next_offset.get(topic, 0))
+            if state.committed < start:
+                state.committed = state.cursor = start
+
+        restored = sum(len(log) for log in self._logs.values())
+        if restored:
+            print(f"  [Broker] Restored {restored} unacknowledged message(s) from {self.db_path}.")
+
+    # --- PUBLISH ---
+    def _make_message(self, topic, offset, sender, content, payload, timestamp):
+        return {"topic": topic, "offset": offset, "sender": sender, "content": content, "payload": payload, "timestamp": timestamp}
+
+    def publish_batch(self, agent_name, messages, topic=TOPIC_AGENT_EVENTS):
+        """
+        Appends many messages to a topic in one operation (one transaction when durable).
+        messages: iterable of (content, payload) tuples. Returns the assigned offsets.
+        """
+        with self._cond:
+            log = self._logs.setdefault(topic, [])
+            next_offset = self._next_offset.get(topic, 0)
+            if not log:
+                self._base_offset[topic] = next_offset
+            now = time.time()
+            batch = []
+            for content, payload in messages:
+                batch.append(self._make_message(topic, next_offset, agent_name, content, payload, now))
+                next_offset += 1
+            if not batch:
+                return []
+
+            if self.conn:
+                self.conn.executemany(
+                    'INSERT INTO broker_messages (topic, msg_offset, sender, content, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(m["topic"], m["offset"], m["sender"], m["content"], json.dumps(m["payload"]) if m["payload"] is not None else None, m["timestamp"])
+                     for m in batch]
+                )
+                self.conn.commit()
+
+            log.extend(batch)
+            self._next_offset[topic] = next_offset
+            if topic not in self.consumer_groups and len(log) > self.max_undeclared_messages:
+                self._truncate(topic, next_offset - self.max_undeclared_messages)
+            self._cond.notify_all()
+        print(f"Message Broker: Received {len(batch)} message(s) from {agent_name} on '{topic}'.")
+        return [m["offset"] for m in batch]
+
+    def publish(self, agent_name, message, payload=None, topic=TOPIC_AGENT_EVENTS):
+        """An agent publishes a message (plus optional structured payload) to a topic."""
+        return self.publish_batch(agent_name, [(message, payload)], topic=topic)[0]
+
+    # --- CONSUME / ACK ---
+    def _consumer(self, topic, consumer):
+        state = self._consumers.get((topic, consumer))
+        if state is None:
+            # New consumers start from the oldest retained message
+            start = self._base_offset.get(topic, self._next_offset.get(topic, 0))
+            state = _ConsumerState(start)
+            self._consumers[(topic, consumer)] = state
+        return state
+
+    def _message_at(self, topic, offset):
+        return self._logs[topic][offset - self._base_offset[topic]]
+
+    def _collect(self, topic, state, max_messages):
+        """Picks expired in-flight messages first, then new ones; marks them in flight."""
+        now = time.monotonic()
+        offsets = sorted(o for o, deadline in state.inflight.items() if deadline <= now)[:max_messages]
+        end = self._next_offset.get(topic, 0)
+        while len(offsets) < max_messages and state.cursor < end:
+            if state.cursor not in state.acked:
+                offsets.append(state.cursor)
+            state.cursor += 1
+        deadline = now + self.redelivery_seconds
+        for offset in offsets:
+            state.inflight[offset] = deadline
+        return [self._message_at(topic, offset) for offset in offsets]
+
+    def consume(self, topic=TOPIC_AGENT_EVENTS, consumer="default", max_messages=100, timeout=0):
+        """
+        Returns up to max_messages for this consumer, blocking up to timeout seconds
+        when none are ready. Messages must be ack()-ed or they are redelivered.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            state = self._consumer(topic, consumer)
+            while True:
+                messages = self._collect(topic, state, max_messages)
+                remaining = deadline - time.monotonic()
+                if messages or remaining <= 0:
+                    return messages
+                # Wake on publish, or when the earliest in-flight message becomes redeliverable
+                if state.inflight:
+                    remaining = min(remaining, max(0.0, min(state.inflight.values()) - time.monotonic()) + 0.01)
+                self._cond.wait(timeout=remaining)
+
+    def ack(self, topic, consumer, offsets):
+        """Acknowledges one offset or a list of offsets; commits the consumer's position."""
+        if isinstance(offsets, int):
+            offsets = [offsets]
+        with self._cond:
+            state = self._consumer(topic, consumer)
+            for offset in offsets:
+                state.inflight.pop(offset, None)
+                if offset >= state.committed:
+                    state.acked.add(offset)
+            previous = state.committed
+            while state.committed in state.acked:
+                state.acked.discard(state.committed)
+                state.committed += 1
+            if state.committed != previous:
+                self._commit_offset(topic, consumer, state.committed)
+
+    def _commit_offset(self, topic, consumer, committed):
+        """Persists a consumer offset and drops log entries every declared consumer has acknowledged."""
+        if self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO broker_offsets (topic, consumer, committed) VALUES (?, ?, ?)', (topic, consumer, committed))
+            self.conn.commit()
+        declared = self.consumer_groups.get(topic)
+        if declared:
+            self._truncate(topic, min(self._consumer(topic, c).committed for c in declared))
+
+    def _truncate(self, topic, low_water):
+        """Drops retained messages below low_water; consumers behind it skip ahead."""
+        base = self._base_offset.get(topic, 0)
+        if low_water <= base:
+            return
+        if self.conn:
+            self.conn.execute('DELETE FROM broker_messages WHERE topic = ? AND msg_offset < ?', (topic, low_water))
+            self.conn.commit()
+        del self._logs[topic][:low_water - base]
+        self._base_offset[topic] = low_water
+        for (t, _), state in self._consumers.items():
+            if t == topic and state.committed < low_water:
+                state.committed, state.cursor = low_water, max(state.cursor, low_water)
+                state.acked = {o for o in state.acked if o >= low_water}
+                state.inflight = {o: d for o, d in state.inflight.items() if o >= low_water}
+
+    def subscribe(self, topic=TOPIC_AGENT_EVENTS, consumer="default", timeout=0):
+        """Retrieves (and immediately acknowledges) the next message for a listening agent."""
+        messages = self.consume(topic, consumer, max_messages=1, timeout=timeout)
+        if not messages:
+            return None
+        message = messages[0]
+        self.ack(topic, consumer, message["offset"])
+        print(f"Message Broker: Dispatching message -> {message['content']}")
+        return message
+
+    def pending_count(self, topic=TOPIC_AGENT_EVENTS):
+        """Messages retained on a topic (not yet acknowledged by every consumer)."""
+        with self._cond:
+            return len(self._logs.get(topic, []))
+
+    def close(self):
+        """Closes the durable log."""
+        with self._cond:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
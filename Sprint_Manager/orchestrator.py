@@ -0,0 +1,94 @@
+# Sprint_Manager/orchestrator.py
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class AgentTask:
+    """One agent step: a report name, the callable that produces the report, and what it waits for."""
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.report = None
+        self.error = None
+        self.started = None   # Seconds since the run started
+        self.finished = None
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+class AgentOrchestrator:
+    """
+    Runs agent steps as a dependency graph instead of a fixed sequence.
+    A step starts as soon as everything it depends on has finished, so independent
+    agents overlap and the run takes as long as its longest chain, not the sum.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.total_seconds = None
+
+    def add_agent(self, name, func, depends_on=()):
+        """Registers a step. Dependencies must already be registered (which also rules out cycles)."""
+        missing = [dep for dep in depends_on if dep not in self.tasks]
+        if missing:
+            raise ValueError(f"'{name}' depends on unknown agent(s): {', '.join(missing)}")
+        self.tasks[name] = AgentTask(name, func, depends_on)
+        return self.tasks[name]
+
+    def _run_task(self, task, run_started):
+        task.started = time.monotonic() - run_started
+        try:
+            task.report = task.func()
+        except Exception as e:
+            # A failed agent must not sink the run; its dependents still get their turn
+            task.error = e
+            task.report = f"❌ {task.name} failed: {e}"
+            print(f"  [Orchestrator] {task.name} failed: {e}")
+        finally:
+            task.finished = time.monotonic() - run_started
+        return task
+
+    def run(self):
+        """Executes every step, returns {name: report} in registration order."""
+        run_started = time.monotonic()
+        pending = dict(self.tasks)
+        done = set()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(1, len(self.tasks))) as executor:
+            while pending or running:
+                for name, task in list(pending.items()):
+                    if all(dep in done for dep in task.depends_on):
+                        print(f"  [Orchestrator] Starting {name}...")
+                        running[executor.submit(self._run_task, task, run_started)] = name
+                        del pending[name]
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done.add(running.pop(future))
+        self.total_seconds = time.monotonic() - run_started
+        return {name: task.report for name, task in self.tasks.items()}
+
+    def critical_path(self):
+        """The dependency chain that ended last, i.e. the one that determined total run time."""
+        if not self.tasks:
+            return []
+        task = max(self.tasks.values(), key=lambda t: t.finished)
+        path = [task]
+        while task.depends_on:
+            task = max((self.tasks[dep] for dep in task.depends_on), key=lambda t: t.finished)
+            path.append(task)
+        return list(reversed(path))
+
+    def get_timing_report(self):
+        """Per-agent wall-clock and critical-path breakdown, as a report section."""
+        sequential = sum(task.duration for task in self.tasks.values())
+        lines = ["## ⏱️ Run Timing"]
+        for task in self.tasks.values():
+            waits = f" (after {', '.join(task.depends_on)})" if task.depends_on else ""
+            status = " ❌" if task.error else ""
+            lines.append(f"- **{task.name}**: {task.duration:.1f}s, started at +{task.started:.1f}s{waits}{status}")
+        path = self.critical_path()
+        lines.append(f"- **Critical Path:** {' → '.join(task.name for task in path)} ({sum(task.duration for task in path):.1f}s)")
+        lines.append(f"- **Total Wall-Clock:** {self.total_seconds:.1f}s (sequential would be ~{sequential:.1f}s)")
+        return "\n".join(lines)
@@ -0,0 +1,109 @@
+# Sprint_Manager/scheduler.py
+import threading
+import time
+from datetime import datetime
+
+class ScheduledJob:
+    """One recurring job. The lock guarantees a job never overlaps with its own previous tick."""
+    def __init__(self, name, func, interval_seconds):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.next_run = time.monotonic()
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_duration = None
+        self.last_finished = None
+
+class AgentScheduler:
+    """
+    A small interval scheduler for daemon mode.
+    Each due job runs on its own thread so a slow agent never delays the others;
+    a tick that comes due while the same job is still running is skipped, not queued.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        print("Agent Scheduler initialized.")
+
+    def add_job(self, name, func, interval_seconds, run_immediately=True):
+        """Registers func to run every interval_seconds."""
+        job = ScheduledJob(name, func, interval_seconds)
+        if not run_immediately:
+            job.next_run += interval_seconds
+        self.jobs[name] = job
+        print(f"  [Scheduler] Job '{name}' every {interval_seconds}s.")
+        return job
+
+    def trigger(self, name):
+        """Makes a job due right now (e.g. in response to an external event)."""
+        job = self.jobs.get(name)
+        if job:
+            job.next_run = time.monotonic()
+            self._wakeup.set()
+
+    def _run_job(self, job):
+        started = time.monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            job.failures += 1
+            print(f"  [Scheduler] Job '{job.name}' failed: {e}")
+        finally:
+            job.runs += 1
+            job.last_duration = time.monotonic() - started
+            job.last_finished = datetime.now()
+            job.lock.release()
+
+    def _dispatch_due_jobs(self):
+        """Starts every due job that is not already running. Returns seconds until the next due job."""
+        now = time.monotonic()
+        for job in self.jobs.values():
+            if job.next_run > now:
+                continue
+            job.next_run = now + job.interval_seconds
+            if not job.lock.acquire(blocking=False):
+                job.skipped += 1
+                print(f"  [Scheduler] Skipping '{job.name}' tick: previous run still in progress.")
+                continue
+            threading.Thread(target=self._run_job, args=(job,), name=f"job-{job.name}", daemon=True).start()
+        if not self.jobs:
+            return 60
+        return max(0.0, min(job.next_run for job in self.jobs.values()) - time.monotonic())
+
+    def run_forever(self):
+        """Blocks, dispatching jobs until stop() is called (or Ctrl+C)."""
+        print("  [Scheduler] Running. Press Ctrl+C to stop.")
+        try:
+            while not self._stopping.is_set():
+                wait_seconds = self._dispatch_due_jobs()
+                self._wakeup.wait(timeout=wait_seconds)
+                self._wakeup.clear()
+        except KeyboardInterrupt:
+            print("\n  [Scheduler] Interrupted, shutting down...")
+        finally:
+            self.stop()
+
+    def is_stopped(self):
+        return self._stopping.is_set()
+
+    def stop(self, timeout=30):
+        """Stops dispatching and waits (up to timeout) for running jobs to finish."""
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for job in self.jobs.values():
+            remaining = max(0.0, deadline - time.monotonic())
+            if job.lock.acquire(timeout=remaining):
+                job.lock.release()
+
+    def get_stats(self):
+        """Per-job run counters for status reporting."""
+        return {
+            name: {"runs": job.runs, "skipped": job.skipped, "failures": job.failures, "last_duration": job.last_duration}
+            for name, job in self.jobs.items()
+        }
@@ -0,0 +1,242 @@
+# Sprint_Manager/sprint_snapshot.py
+import threading
+from datetime import datetime, timedelta, timezone
+from .Services.jira_service import parse_jira_datetime
+from .config import get_setting
+
+class SprintSnapshot:
+    """
+    A run-scoped, in-memory view of the board shared by all agents.
+    The sprint and the relevant backlog are fetched once with the union of the
+    fields every agent needs, then indexed by key, status and assignee so each
+    agent's query is answered from memory instead of another Jira round trip.
+    In daemon mode later refreshes only fetch the issues updated since the newest
+    'updated' already indexed and merge them in; a full reload happens periodically.
+    """
+
+    # Union of the fields used by Triage, Developer Assistant, QA and Scrum Master
+    FIELDS = ["summary", "status", "created", "updated", "assignee", "description", "priority", "labels", "issuetype"]
+
+    # Everything outside the sprint that any agent looks at
+    BACKLOG_JQL = (
+        '(status = "To Do" AND assignee IS EMPTY) '
+        'OR status in ("In Progress", "In Review") '
+        'OR (status = "Done" AND updated >= -7d)'
+    )
+
+    def __init__(self, jira_service, sprint_id):
+        self.jira_service = jira_service
+        self.sprint_id = sprint_id
+        # Story points feed the daily sprint snapshots, so they are fetched with everything else
+        self.fields = self.FIELDS + [get_setting('jira', 'story_points_field', 'customfield_10016')]
+        # Sprint membership of changed issues is read from the sprint field on incremental refreshes
+        self.sprint_field = get_setting('jira', 'sprint_field', 'customfield_10020')
+        self.full_reload_seconds = get_setting('daemon', 'snapshot_full_reload_seconds', 3600)
+        self.sprint_details = {}
+        self.current_account_id = None
+        self.loaded_at = None
+        self.full_loaded_at = None
+        self.watermark = None # Newest 'updated' among indexed issues
+        self._stale = False
+        self._lock = threading.RLock()
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        self.watermark = None
+        self.by_key = {}
+        self.by_status = {}
+        self.by_assignee = {}
+        self.sprint_keys = []
+
+    def _status_of(self, issue):
+        return (issue['fields'].get('status') or {}).get('name')
+
+    def _assignee_of(self, issue):
+        return (issue['fields'].get('assignee') or {}).get('accountId')
+
+    def _index(self, issue, advance_watermark=True):
+        key = issue['key']
+        self.by_key[key] = issue
+        self.by_status.setdefault(self._status_of(issue), []).append(key)
+        self.by_assignee.setdefault(self._assignee_of(issue), []).append(key)
+        updated = parse_jira_datetime(issue['fields'].get('updated'))
+        if advance_watermark and updated and (self.watermark is None or updated > parse_jira_datetime(self.watermark)):
+            self.watermark = issue['fields']['updated']
+
+    def _unindex(self, issue):
+        key = issue['key']
+        self.by_status.get(self._status_of(issue), []).remove(key)
+        self.by_assignee.get(self._assignee_of(issue), []).remove(key)
+
+    def load(self):
+        """Fetches the sprint and backlog once and rebuilds the in-memory indexes."""
+        with self._lock:
+            print(f"  [Snapshot] Loading shared issue snapshot for Sprint {self.sprint_id}...")
+            self._reset_indexes()
+
+            try:
+                self.sprint_details = self.jira_service.get_sprint(self.sprint_id)
+            except Exception as e:
+                print(f"  [Snapshot] Warning: Could not fetch sprint details: {e}")
+                self.sprint_details = {}
+
+            if self.current_account_id is None:
+                self.current_account_id = self.jira_service.get_current_user().get('accountId')
+
+            # 1. Full sprint issue list
+            for issue in self.jira_service.iter_sprint_issues(self.sprint_id, self.fields):
+                self._index(issue)
+                self.sprint_keys.append(issue['key'])
+
+            # 2. Backlog / board issues outside the sprint (de-duplicated by key)
+            for issue in self.jira_service.search_issues(self.BACKLOG_JQL, self.fields):
+                if issue['key'] not in self.by_key:
+                    self._index(issue)
+
+            self.loaded_at = self.full_loaded_at = datetime.now()
+            self._stale = False
+            print(f"  [Snapshot] Indexed {len(self.by_key)} issues ({len(self.sprint_keys)} in sprint).")
+        return self
+
+    # --- INCREMENTAL UPDATES ---
+    def _in_backlog_scope(self, issue):
+        """Python equivalent of BACKLOG_JQL for one issue."""
+        status = self._status_of(issue)
+        if status == "To Do":
+            return self._assignee_of(issue) is None
+        if status == "Done":
+            updated = parse_jira_datetime(issue['fields'].get('updated'))
+            return bool(updated) and updated >= datetime.now(timezone.utc) - timedelta(days=7)
+        return status in ("In Progress", "In Review")
+
+    def _in_sprint(self, issue):
+        sprints = issue['fields'].get(self.sprint_field) or []
+        return any(isinstance(sprint, dict) and sprint.get('id') == self.sprint_id for sprint in sprints)
+
+    def merge_issue(self, issue, advance_watermark=True):
+        """
+        Replaces (or drops, if it left the sprint and backlog scope) one issue with a fresher copy.
+        Pushed copies (webhooks) pass advance_watermark=False: other issues changed before them may
+        not have been fetched yet, so they must not move the incremental query's starting point.
+        """
+        with self._lock:
+            key = issue['key']
+            current = self.by_key.get(key)
+            if current is not None:
+                incoming = parse_jira_datetime(issue['fields'].get('updated'))
+                known = parse_jira_datetime(current['fields'].get('updated'))
+                if incoming and known and incoming < known:
+                    return # Out-of-order delivery; the indexed copy is newer
+            in_sprint = self._in_sprint(issue) if self.sprint_field in issue['fields'] else key in self.sprint_keys
+            if key in self.by_key:
+                self._unindex(self.by_key.pop(key))
+            if key in self.sprint_keys and not in_sprint:
+                self.sprint_keys.remove(key)
+            if in_sprint or self._in_backlog_scope(issue):
+                self._index(issue, advance_watermark)
+                if in_sprint and key not in self.sprint_keys:
+                    self.sprint_keys.append(key)
+
+    def update(self):
+        """Fetches only the issues updated since the newest one indexed and merges them in."""
+        with self._lock:
+            since = self.jira_service.updated_since_clause(self.watermark) if self.watermark else None
+            if since is None:
+                return self.load()
+            changed = 0
+            for issue in self.jira_service.search_issues(since, self.fields + [self.sprint_field]):
+                self.merge_issue(issue)
+                changed += 1
+            self.loaded_at = datetime.now()
+            self._stale = False
+            print(f"  [Snapshot] Merged {changed} changed issue(s); {len(self.by_key)} indexed ({len(self.sprint_keys)} in sprint).")
+        return self
+
+    def refresh(self, max_age_seconds):
+        """
+        Brings the snapshot up to date when it is missing, stale or older than max_age_seconds
+        (daemon mode): incrementally, or with a full reload every snapshot_full_reload_seconds.
+        """
+        with self._lock:
+            now = datetime.now()
+            if self.loaded_at is None or (now - self.full_loaded_at).total_seconds() > self.full_reload_seconds:
+                self.load()
+            elif self._stale or (now - self.loaded_at).total_seconds() > max_age_seconds:
+                self.update()
+        return self
+
+    def is_loaded(self):
+        """True once the snapshot holds data (agents with their own incremental query skip a cold snapshot)."""
+        return self.loaded_at is not None
+
+    def invalidate(self):
+        """Marks the snapshot stale so the next refresh fetches the changes right away."""
+        with self._lock:
+            self._stale = True
+
+    def _ensure_loaded(self):
+        if self.loaded_at is None:
+            with self._lock:
+                if self.loaded_at is None:
+                    self.load()
+
+    def apply_update(self, issue_key, fields):
+        """Mirrors a write made to Jira into the snapshot so later agents see it."""
+        with self._lock:
+            issue = self.by_key.get(issue_key)
+            if issue is None:
+                return
+            self._unindex(issue)
+            issue['fields'].update(fields)
+            self._index(issue)
+
+    # --- AGENT VIEWS ---
+
+    def get(self, issue_key):
+        self._ensure_loaded()
+        with self._lock:
+            return self.by_key.get(issue_key)
+
+    def issues_with_status(self, status, assignee_id=False):
+        """All indexed issues in a status, optionally restricted to one assignee (None = unassigned)."""
+        self._ensure_loaded()
+        with self._lock:
+            keys = self.by_status.get(status, [])
+            if assignee_id is not False:
+                assignee_keys = set(self.by_assignee.get(assignee_id, []))
+                keys = [k for k in keys if k in assignee_keys]
+            return [self.by_key[k] for k in keys]
+
+    def untriaged_issues(self):
+        """Equivalent of: status = "To Do" AND assignee IS EMPTY"""
+        return self.issues_with_status("To Do", assignee_id=None)
+
+    def my_in_progress_issues(self):
+        """Equivalent of: assignee = currentUser() AND status = "In Progress\""""
+        self._ensure_loaded()
+        return self.issues_with_status("In Progress", assignee_id=self.current_account_id)
+
+    def in_review_issues(self):
+        """Equivalent of: status = "In Review\""""
+        return self.issues_with_status("In Review")
+
+    def recently_done_issues(self, days=7):
+        """Equivalent of: status = "Done" AND updated >= -{days}d"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        done = []
+        for issue in self.issues_with_status("Done"):
+            updated = parse_jira_datetime(issue['fields'].get('updated'))
+            if updated and updated >= cutoff:
+                done.append(issue)
+        return done
+
+    def get_sprint_details(self):
+        """Sprint metadata (dates) fetched alongside the snapshot."""
+        self._ensure_loaded()
+        return self.sprint_details
+
+    def sprint_issues(self):
+        """Every issue in the active sprint."""
+        self._ensure_loaded()
+        with self._lock:
+            return [self.by_key[k] for k in self.sprint_keys]
@@ -0,0 +1,167 @@
+# Sprint_Manager/webhook_server.py
+import hashlib
+import hmac
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from .config import get_setting
+from .message_broker import TOPIC_JIRA_WEBHOOK
+
+# Jira webhook events we react to, mapped to the label used in broker messages
+SUPPORTED_EVENTS = {
+    "jira:issue_created": "ISSUE_CREATED",
+    "jira:issue_updated": "ISSUE_UPDATED",
+    "comment_created": "COMMENT_CREATED",
+    "comment_updated": "COMMENT_UPDATED",
+}
+# Events whose payload holds the complete issue (comment events only carry a few of its fields)
+ISSUE_EVENTS = {"jira:issue_created", "jira:issue_updated"}
+
+class JiraWebhookServer:
+    """
+    An embedded HTTP endpoint for Jira webhooks.
+    Accepted payloads are de-duplicated (Jira retries deliveries) and enqueued into the
+    MessageBroker, so agents can react to single-issue events instead of re-scanning boards.
+    """
+
+    def __init__(self, message_broker, host=None, port=None, path=None, secret=None, dedupe_size=None):
+        self.message_broker = message_broker
+        self.host = host or get_setting('webhook', 'host', '127.0.0.1')
+        self.port = port if port is not None else get_setting('webhook', 'port', 8765)
+        self.path = path or get_setting('webhook', 'path', '/webhook')
+        self.secret = secret or get_setting('webhook', 'secret')
+        self.dedupe_size = dedupe_size or get_setting('webhook', 'dedupe_size', 10000)
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.stats = {"received": 0, "accepted": 0, "duplicates": 0, "ignored": 0, "rejected": 0}
+
+    # --- PAYLOAD HANDLING ---
+    def _count(self, name):
+        """Bumps one stats counter (handlers run on the HTTP server's worker threads)."""
+        with self._lock:
+            self.stats[name] += 1
+
+    def _dedupe_key(self, event, payload):
+        """A stable identity for one delivery: the same change redelivered maps to the same key."""
+        issue = payload.get('issue') or {}
+        comment = payload.get('comment') or {}
+        changelog = payload.get('changelog') or {}
+        if event.startswith("comment_"):
+            version = comment.get('updated') or comment.get('created')
+            return f"{event}:{comment.get('id')}:{version}"
+        if changelog.get('id'):
+            return f"{event}:{issue.get('key')}:changelog:{changelog['id']}"
+        return f"{event}:{issue.get('key')}:{(issue.get('fields') or {}).get('updated') or payload.get('timestamp')}"
+
+    def _is_duplicate(self, dedupe_key):
+        """Remembers the last dedupe_size deliveries (LRU) and reports repeats."""
+        with self._lock:
+            if dedupe_key in self._seen:
+                self._seen.move_to_end(dedupe_key)
+                return True
+            self._seen[dedupe_key] = True
+            if len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+            return False
+
+    def _is_authorized(self, raw_body, headers, query):
+        """Checks the shared secret, as an HMAC 'X-Hub-Signature' header or a '?secret=' URL token."""
+        if not self.secret:
+            return True
+        signature = headers.get('X-Hub-Signature', '')
+        if signature.startswith('sha256='):
+            expected = hmac.new(self.secret.encode('utf-8'), raw_body, hashlib.sha256).hexdigest()
+            return hmac.compare_digest(signature[len('sha256='):], expected)
+        token = (query.get('secret') or [''])[0]
+        return hmac.compare_digest(token, self.secret)
+
+    def handle_payload(self, payload):
+        """
+        Validates, de-duplicates and enqueues one webhook payload.
+        Returns (http_status, reason). Also usable directly, without HTTP.
+        """
+        self._count("received")
+        event = payload.get('webhookEvent') if isinstance(payload, dict) else None
+        label = SUPPORTED_EVENTS.get(event)
+        issue = (payload.get('issue') or {}) if isinstance(payload, dict) else {}
+        if not label or not issue.get('key'):
+            self._count("ignored")
+            return 200, "ignored"
+
+        if self._is_duplicate(self._dedupe_key(event, payload)):
+            self._count("duplicates")
+            return 200, "duplicate"
+
+        summary = (issue.get('fields') or {}).get('summary', '')
+        event_data = {
+            "event": event,
+            "issue_key": issue['key'],
+            "issue_id": issue.get('id'),
+            "summary": summary,
+            "comment_id": (payload.get('comment') or {}).get('id'),
+            "changelog_items": [item.get('field') for item in (payload.get('changelog') or {}).get('items', [])],
+            "timestamp": payload.get('timestamp'),
+            # Who caused the event (the comment author for comment events), so our own writes can be ignored
+            "actor_account_id": (payload.get('user') or (payload.get('comment') or {}).get('author') or {}).get('accountId'),
+            # Issue events carry the full issue, which lets the dispatcher update the snapshot in place
+            "issue": {"key": issue['key'], "id": issue.get('id'), "fields": issue.get('fields') or {}} if event in ISSUE_EVENTS else None,
+        }
+        self.message_broker.publish("JiraWebhook", f"{label}: Issue {issue['key']} ({summary})", payload=event_data, topic=TOPIC_JIRA_WEBHOOK)
+        self._count("accepted")
+        return 202, "accepted"
+
+    # --- HTTP SERVER ---
+    def _make_handler(self):
+        server = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def _reply(self, status, reason):
+                body = json.dumps({"status": reason}).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != server.path:
+                    return self._reply(404, "not found")
+                raw_body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+                if not server._is_authorized(raw_body, self.headers, parse_qs(url.query)):
+                    server._count("rejected")
+                    return self._reply(403, "forbidden")
+                try:
+                    payload = json.loads(raw_body or b'{}')
+                except json.JSONDecodeError:
+                    server._count("rejected")
+                    return self._reply(400, "invalid json")
+                self._reply(*server.handle_payload(payload))
+
+            def log_message(self, format, *args):
+                pass # Keep the console readable; stats are tracked instead
+
+        return WebhookHandler
+
+    def start(self):
+        """Starts serving on a background thread."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self._server.server_address[1] # Resolves port 0 to the bound port
+        self._thread = threading.Thread(target=self._server.serve_forever, name="jira-webhook", daemon=True)
+        self._thread.start()
+        print(f"  [Webhook] Listening for Jira webhooks on http://{self.host}:{self.port}{self.path}")
+        return self
+
+    def stop(self):
+        """Stops the HTTP server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            with self._lock:
+                stats = dict(self.stats)
+            print(f"  [Webhook] Stopped. Stats: {stats}")
@@ -0,0 +1,51 @@
+# Sprint_Manager/workload_sync.py
+from .config import get_setting
+
+class WorkloadSync:
+    """
+    Recomputes developer workloads from Jira instead of trusting the running counter.
+    One paginated query lists every open, assigned issue on the board; counts and story
+    points are aggregated per assignee in memory and written to the KB in one transaction,
+    so the cost is proportional to the number of open issues.
+    """
+    JQL = 'assignee IS NOT EMPTY AND statusCategory != Done'
+
+    def __init__(self, jira_service, kb, board_id, story_points_field=None):
+        self.jira_service = jira_service
+        self.kb = kb
+        self.board_id = board_id
+        self.story_points_field = story_points_field or get_setting('jira', 'story_points_field', 'customfield_10016')
+
+    def _aggregate(self, issues):
+        """{account_id: [open_issues, story_points]} plus display names, in one pass."""
+        totals, names = {}, {}
+        for issue in issues:
+            assignee = issue['fields'].get('assignee') or {}
+            account_id = assignee.get('accountId')
+            if not account_id:
+                continue
+            entry = totals.setdefault(account_id, [0, 0])
+            entry[0] += 1
+            points = issue['fields'].get(self.story_points_field)
+            if isinstance(points, (int, float)):
+                entry[1] += points
+            names[account_id] = assignee.get('displayName', account_id)
+        return totals, names
+
+    def sync(self):
+        """Pulls open assigned issues, updates every profile's workload, and returns a report."""
+        print("\n--- ⚖️ Workload Sync ---")
+        fields = ["assignee", self.story_points_field]
+        issues = self.jira_service.iter_board_issues(self.board_id, fields, jql=self.JQL)
+        totals, names = self._aggregate(issues)
+
+        changed = self.kb.sync_developer_workloads({account_id: tuple(values) for account_id, values in totals.items()})
+        known = {profile[0] for profile in self.kb.get_all_developer_profiles()}
+        untracked = sorted(names[account_id] for account_id in totals if account_id not in known)
+
+        open_issues = sum(values[0] for values in totals.values())
+        print(f"  [Workload Sync] {open_issues} open issues across {len(totals)} assignees; {changed} profile(s) corrected.")
+        report = [f"Recomputed workloads from {open_issues} open assigned issues: {changed} developer profile(s) corrected."]
+        if untracked:
+            report.append(f"- ℹ️ Assignees without a developer profile (not tracked): {', '.join(untracked)}")
+        return "\n".join(report)
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Micro-benchmark for the ADF text extractor on large, deeply nested Jira documents.
+# Usage:
+#   python benchmarks/adf_benchmark.py                          (2,000 blocks, nesting depth 8)
+#   python benchmarks/adf_benchmark.py --blocks 20000 --depth 50
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Sprint_Manager.adf import adf_to_text, ADFTextCache
+
+WORDS = ["login", "fails", "when", "the", "token", "expires", "api", "returns", "500", "retry", "cache", "user"]
+
+def timed(label, operations, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<44} {operations / elapsed:>12,.0f} docs/s  ({elapsed * 1000 / operations:,.3f} ms/doc)")
+    return result
+
+def text(words=8):
+    return {"type": "text", "text": " ".join(random.choice(WORDS) for _ in range(words))}
+
+def paragraph():
+    return {"type": "paragraph", "content": [text(), {"type": "mention", "attrs": {"text": "@dev"}}, text(4)]}
+
+def nested_list(depth):
+    item = {"type": "listItem", "content": [paragraph()]}
+    if depth > 1:
+        item["content"].append(nested_list(depth - 1))
+    return {"type": random.choice(["bulletList", "orderedList"]), "content": [item, {"type": "listItem", "content": [paragraph()]}]}
+
+def table(rows=5, columns=4):
+    return {"type": "table", "content": [
+        {"type": "tableRow", "content": [{"type": "tableCell", "content": [paragraph()]} for _ in range(columns)]}
+        for _ in range(rows)]}
+
+def build_document(blocks, depth):
+    builders = [paragraph, lambda: nested_list(depth), table,
+                lambda: {"type": "codeBlock", "attrs": {"language": "python"}, "content": [text(20)]},
+                lambda: {"type": "panel", "content": [paragraph(), paragraph()]}]
+    return {"type": "doc", "version": 1, "content": [random.choice(builders)() for _ in range(blocks)]}
+
+def deep_document(depth):
+    """A single chain of nested lists `depth` levels deep (past Python's recursion limit when large)."""
+    node = {"type": "paragraph", "content": [text()]}
+    for _ in range(depth):
+        node = {"type": "bulletList", "content": [{"type": "listItem", "content": [paragraph(), node]}]}
+    return {"type": "doc", "content": [node]}
+
+parser = argparse.ArgumentParser(description="ADF extractor micro-benchmark.")
+parser.add_argument("--blocks", type=int, default=2000, help="Top-level blocks per document.")
+parser.add_argument("--depth", type=int, default=8, help="Nesting depth of the generated lists.")
+parser.add_argument("--docs", type=int, default=20, help="Documents per measurement.")
+parser.add_argument("--max-chars", type=int, default=2000, help="Output cap (the LLM prompt budget).")
+args = parser.parse_args()
+
+random.seed(42)
+documents = [build_document(args.blocks, args.depth) for _ in range(args.docs)]
+full_length = len(adf_to_text(documents[0]))
+print(f"\n--- ADF extractor benchmark: {args.docs} docs x {args.blocks:,} blocks, depth {args.depth} (~{full_length:,} chars each) ---")
+
+timed("adf_to_text (full document)", args.docs, lambda: [adf_to_text(d) for d in documents])
+timed(f"adf_to_text (capped at {args.max_chars:,} chars)", args.docs, lambda: [adf_to_text(d, args.max_chars) for d in documents])
+
+cache = ADFTextCache(max_entries=args.docs)
+timed("ADFTextCache.text (cold)", args.docs, lambda: [cache.text(f"BENCH-{i}", "v1", d, args.max_chars) for i, d in enumerate(documents)])
+timed("ADFTextCache.text (warm, same key + updated)", args.docs, lambda: [cache.text(f"BENCH-{i}", "v1", d, args.max_chars) for i, d in enumerate(documents)])
+
+deep = deep_document(max(sys.getrecursionlimit() * 2, 5000))
+timed(f"adf_to_text (one chain {max(sys.getrecursionlimit() * 2, 5000):,} levels deep)", 1, lambda: adf_to_text(deep))
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+# Micro-benchmark for the KnowledgeBase storage layer: assignee lookups and workload
+# updates against a large developer_profiles table.
+# Usage:
+#   python benchmarks/kb_benchmark.py                       (10,000 profiles)
+#   python benchmarks/kb_benchmark.py --profiles 50000 --threads 8
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Sprint_Manager.knowledge_base import KnowledgeBase
+
+SPECIALIZATIONS = ["Frontend", "Backend", "DevOps", "FullStack", "Mobile", "Data", "QA", "Security"]
+
+def timed(label, operations, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<48} {operations / elapsed:>12,.0f} ops/s  ({elapsed * 1000:,.1f} ms)")
+
+parser = argparse.ArgumentParser(description="KnowledgeBase micro-benchmark.")
+parser.add_argument("--profiles", type=int, default=10000, help="Developer profiles to seed.")
+parser.add_argument("--operations", type=int, default=5000, help="Lookups / updates per measurement.")
+parser.add_argument("--threads", type=int, default=4, help="Reader threads for the concurrent lookup test.")
+args = parser.parse_args()
+
+random.seed(42)
+with tempfile.TemporaryDirectory() as tmp:
+    kb = KnowledgeBase(os.path.join(tmp, "bench.db"))
+    profiles = [(f"dev-{i}", f"Developer {i}", random.choice(SPECIALIZATIONS), random.randint(0, 10))
+                for i in range(args.profiles)]
+    print(f"\n--- KnowledgeBase benchmark: {args.profiles:,} profiles, {args.operations:,} operations ---")
+    timed("Seed profiles (one transaction)", args.profiles, lambda: kb.upsert_developer_profiles(profiles))
+
+    plan = kb.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT developer_id, name, current_workload FROM developer_profiles "
+        "WHERE specialization = ? ORDER BY current_workload ASC LIMIT 1", ("Backend",)).fetchall()
+    print(f"  Assignee query plan: {plan[0][-1]}")
+
+    specs = [random.choice(SPECIALIZATIONS) for _ in range(args.operations)]
+    dev_ids = [random.choice(profiles)[0] for _ in range(args.operations)]
+
+    timed("get_best_assignee (single thread)", args.operations,
+          lambda: [kb.get_best_assignee(spec) for spec in specs])
+
+    def concurrent_lookups():
+        chunk = args.operations // args.threads
+        workers = [threading.Thread(target=lambda part: [kb.get_best_assignee(spec) for spec in part],
+                                    args=(specs[i * chunk:(i + 1) * chunk],)) for i in range(args.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    timed(f"get_best_assignee ({args.threads} threads, own connections)", args.operations // args.threads * args.threads, concurrent_lookups)
+
+    timed("update_developer_workload (one commit each)", args.operations,
+          lambda: [kb.update_developer_workload(dev_id, random.randint(0, 10)) for dev_id in dev_ids])
+    timed("update_developer_workloads (one batch)", args.operations,
+          lambda: kb.update_developer_workloads({dev_id: random.randint(0, 10) for dev_id in dev_ids}))
+    timed("adjust_developer_workloads (one batch)", args.operations,
+          lambda: kb.adjust_developer_workloads({dev_id: 1 for dev_id in dev_ids}))
+    timed("get_average_velocity", args.operations,
+          lambda: [kb.get_average_velocity() for _ in range(args.operations)])
+    kb.close()
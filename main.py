@@ -1,5 +1,7 @@
 # main.py
 import os
+import argparse
+import threading
 import requests
 from dotenv import load_dotenv
 
@@ -12,18 +14,33 @@ from Sprint_Manager.Agents.triage_agent import TriageAgent # <-- NEW IMPORT
 # --- Service & Infrastructure Imports ---
 from Sprint_Manager.knowledge_base import KnowledgeBase
 from Sprint_Manager.Services.notification_service import NotificationService
-from Sprint_Manager.message_broker import MessageBroker
+from Sprint_Manager.message_broker import MessageBroker, TOPIC_DEVELOPER_ALERTS, TOPIC_JIRA_WEBHOOK
+from Sprint_Manager.sprint_snapshot import SprintSnapshot
+from Sprint_Manager.Services.jira_client import JiraClient
+from Sprint_Manager.Services.jira_service import JiraService
+from Sprint_Manager.Services.jira_write_queue import JiraWriteQueue
+from Sprint_Manager.Services.llm_cache import get_shared_cache
+from Sprint_Manager.Services.llm_service import LLMService
+from Sprint_Manager.Services.rate_limiter import get_all_limiter_stats
+from Sprint_Manager.scheduler import AgentScheduler
+from Sprint_Manager.orchestrator import AgentOrchestrator
+from Sprint_Manager.workload_sync import WorkloadSync
+from Sprint_Manager.flow_analytics import FlowAnalytics
+from Sprint_Manager.webhook_server import JiraWebhookServer
+from Sprint_Manager.config import get_setting
 
 load_dotenv()
 
+# Broker consumer that turns webhook events into daemon ticks
+WEBHOOK_CONSUMER = "daemon-dispatcher"
+
 def get_active_sprint_id(domain, email, token, board_id):
     print("🔎 Attempting to find the active sprint...")
     url = f"{domain}/rest/agile/1.0/board/{board_id}/sprint"
-    auth = (email, token)
-    headers = {"Accept": "application/json"}
+    client = JiraClient.shared(domain, email, token)
     params = {"state": "active"}
     try:
-        response = requests.get(url, headers=headers, auth=auth, params=params)
+        response = client.get(url, params=params)
         response.raise_for_status()
         sprints = response.json().get('values', [])
         if sprints:
@@ -37,63 +54,60 @@ def get_active_sprint_id(domain, email, token, board_id):
         print(f"HTTP Error while finding sprint ID: {err}")
         return None
 
-if __name__ == "__main__":
-    print("\n========================================")
-    print("   ✈️   JIRA AUTOPILOT - SYSTEM START   ")
-    print("========================================\n")
-
-    # 1. Environment Setup
-    env_vars = ["JIRA_DOMAIN", "JIRA_EMAIL", "API_TOKEN", "BOARD_ID", "GEMINI_API_KEY"]
-    if not all(os.getenv(k) for k in env_vars):
-        print("❌ Error: Missing required environment variables. Check your .env file.")
-        exit()
-
-    JIRA_DOMAIN = os.getenv("JIRA_DOMAIN")
-    JIRA_EMAIL = os.getenv("JIRA_EMAIL")
-    API_TOKEN = os.getenv("API_TOKEN")
-    BOARD_ID = os.getenv("BOARD_ID")
-
-    SPRINT_ID = get_active_sprint_id(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN, BOARD_ID)
-    if not SPRINT_ID:
-        print("\n--- 🛑 JIRA AutoPilot run halted: No Active Sprint ---"); exit()
-
+def build_system(domain, email, token, board_id, sprint_id):
+    """Creates the shared infrastructure and agents once. Daemon mode reuses them across ticks."""
     # 2. Infrastructure Initialization
     print("\n--- 🛠️  Initializing Core Systems ---")
     kb = KnowledgeBase()      # Database for history & profiles
-    broker = MessageBroker()  # Inter-agent communication
+    # Inter-agent communication (SQLite-backed when broker.durable is set, so alerts survive a crash)
+    broker = MessageBroker(
+        db_path=get_setting('broker', 'path', 'data/broker.db') if get_setting('broker', 'durable', True) else None,
+        redelivery_seconds=get_setting('broker', 'redelivery_seconds', 30),
+        # Declared readers hold messages until they ack them, even before their first consume
+        consumer_groups=get_setting('broker', 'consumer_groups', {
+            TOPIC_DEVELOPER_ALERTS: [ScrumMasterAgent.CONSUMER_NAME],
+            TOPIC_JIRA_WEBHOOK: [WEBHOOK_CONSUMER],
+        }),
+        max_undeclared_messages=get_setting('broker', 'max_undeclared_messages', 1000),
+    )
+    llm_service = LLMService() # One Gemini client shared by every agent
+
+    # One shared snapshot of the sprint + backlog, queried once and served to every agent
+    jira_client = JiraClient.shared(domain, email, token)
+    jira_service = JiraService(jira_client.auth, jira_client.headers, domain, client=jira_client)
+    snapshot = SprintSnapshot(jira_service, sprint_id)
+    # Jira mutations from every agent go through one write-behind queue
+    write_queue = JiraWriteQueue(jira_service)
+    # Authoritative developer workloads, recomputed from open board issues
+    workload_sync = WorkloadSync(jira_service, kb, board_id)
+    # Cycle time / bottleneck analytics from issue changelogs, shared by QA and the Scrum Master
+    flow_analytics = FlowAnalytics(jira_service, kb)
     
     # 3. Agent Initialization
     print("\n--- 🤖 Initializing Autonomous Agents ---")
     
     # The Triage Agent needs the KB to find the best developer
-    triage_agent = TriageAgent(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN, kb)
+    triage_agent = TriageAgent(domain, email, token, kb, snapshot=snapshot, llm_service=llm_service, write_queue=write_queue)
     
     # The Developer Assistant needs the Broker to report blockers
-    dev_agent = DeveloperAssistantAgent(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN, broker)
+    dev_agent = DeveloperAssistantAgent(domain, email, token, broker, snapshot=snapshot, kb=kb, llm_service=llm_service, write_queue=write_queue)
     
     # The Scrum Master needs the KB (history) and Broker (to receive alerts)
-    scrum_master_agent = ScrumMasterAgent(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN, SPRINT_ID, kb, broker)
+    scrum_master_agent = ScrumMasterAgent(domain, email, token, sprint_id, kb, broker, snapshot=snapshot, write_queue=write_queue,
+                                          flow_analytics=flow_analytics)
     
-    qa_agent = QAReleaseAgent(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN)
+    qa_agent = QAReleaseAgent(domain, email, token, snapshot=snapshot, llm_service=llm_service, flow_analytics=flow_analytics)
 
-    # 4. Execution Loop
-    print("\n--- ▶️  Executing Agent Workflows ---")
-    all_reports = {}
-    
-    # Step A: Triage First (Assign new work so it can be monitored)
-    all_reports['Triage Agent'] = triage_agent.execute()
-    
-    # Step B: Developer Assistant (Monitor work in progress & code activity)
-    all_reports['Developer Assistant Agent'] = dev_agent.execute()
-    
-    # Step C: QA Agent (Check items ready for release)
-    all_reports['QA & Release Agent'] = qa_agent.execute()
-    
-    # Step D: Scrum Master (Overall health & handling agent alerts)
-    # This runs last to capture messages published by Dev Agent during Step B
-    all_reports['Scrum Master Agent'] = scrum_master_agent.execute()
+    return {
+        "domain": domain, "email": email, "token": token, "board_id": board_id,
+        "kb": kb, "broker": broker, "jira_client": jira_client, "snapshot": snapshot, "write_queue": write_queue,
+        "workload_sync": workload_sync,
+        "triage": triage_agent, "developer_assistant": dev_agent,
+        "qa_release": qa_agent, "scrum_master": scrum_master_agent,
+    }
 
-    # 5. Reporting
+def send_reports(all_reports):
+    """Emails the reports, or dumps them to the console when email is not configured."""
     print("\n--- 📧 Finalizing & Sending Report ---")
     SENDER_EMAIL = os.getenv("SENDER_EMAIL")
     SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
@@ -109,7 +123,188 @@ if __name__ == "__main__":
         for agent, report in all_reports.items():
             print(f"\n[{agent}]\n{report}")
 
-    kb.close()
+def run_once(system):
+    """The classic one-shot run: every agent once, concurrently where dependencies allow, then one report."""
+    print("\n--- ▶️  Executing Agent Workflows ---")
+    orchestrator = AgentOrchestrator()
+    sync_enabled = get_setting('workload_sync', 'enabled', True)
+
+    # Correct developer workloads from Jira before anyone reads them
+    if sync_enabled:
+        orchestrator.add_agent('Workload Sync', system["workload_sync"].sync)
+    # Triage assigns unassigned "To Do" tickets, using the synced workloads
+    orchestrator.add_agent('Triage Agent', system["triage"].execute, depends_on=['Workload Sync'] if sync_enabled else [])
+    # Developer Assistant only reads "In Progress" work, never Triage's output, so the two run concurrently
+    orchestrator.add_agent('Developer Assistant Agent', system["developer_assistant"].execute)
+    # QA only reads Done work, so it runs alongside the others
+    orchestrator.add_agent('QA & Release Agent', system["qa_release"].execute)
+    # Scrum Master needs the Developer Assistant's broker alerts, and the workloads after Triage's assignments
+    orchestrator.add_agent('Scrum Master Agent', system["scrum_master"].execute,
+                           depends_on=['Triage Agent', 'Developer Assistant Agent'])
+
+    all_reports = orchestrator.run()
+    all_reports['Run Timing'] = orchestrator.get_timing_report()
+    print(f"\n{all_reports['Run Timing']}")
+
+    # 5. Reporting
+    send_reports(all_reports)
+
+# Which daemon jobs a Jira webhook event should wake up
+WEBHOOK_TRIGGERS = {
+    "jira:issue_created": ["triage"],
+    "jira:issue_updated": ["triage", "developer_assistant"],
+    "comment_created": ["developer_assistant"],
+    "comment_updated": ["developer_assistant"],
+}
+
+def dispatch_webhook_events(broker, scheduler, snapshot):
+    """
+    Turns queued webhook events into immediate (de-duplicated) agent ticks. Issue events are
+    merged into the snapshot in place; events caused by AutoPilot's own account wake no agent.
+    """
+    autopilot_account_id = snapshot.current_account_id
+    while not scheduler.is_stopped():
+        messages = broker.consume(TOPIC_JIRA_WEBHOOK, WEBHOOK_CONSUMER, max_messages=500, timeout=1.0)
+        if not messages:
+            continue
+        if autopilot_account_id is None:
+            try:
+                autopilot_account_id = snapshot.jira_service.get_current_user().get('accountId')
+            except Exception as e:
+                print(f"  [Daemon] Could not resolve the AutoPilot account, not filtering own events: {e}")
+        jobs = set()
+        for message in messages:
+            event = message.get('payload') or {}
+            if event.get('issue'):
+                snapshot.merge_issue(event['issue'], advance_watermark=False)
+            elif event.get('event') in WEBHOOK_TRIGGERS:
+                snapshot.invalidate() # No full issue in the event; the next refresh fetches the change
+            if autopilot_account_id and event.get('actor_account_id') == autopilot_account_id:
+                continue
+            jobs.update(WEBHOOK_TRIGGERS.get(event.get('event'), []))
+        for job_name in sorted(jobs):
+            scheduler.trigger(job_name)
+        broker.ack(TOPIC_JIRA_WEBHOOK, WEBHOOK_CONSUMER, [m['offset'] for m in messages])
+
+def run_daemon(system):
+    """
+    Resident mode: agents run on their own intervals with warm clients, caches and
+    DB connection. The Scrum Master tick sends the combined latest reports.
+    """
+    print("\n--- 🔁 Starting Daemon Mode ---")
+    scheduler = AgentScheduler()
+    snapshot = system["snapshot"]
+    webhook_enabled = get_setting('webhook', 'enabled', False)
+    # Webhooks keep the snapshot current between ticks, so polling it is only a safety net
+    snapshot_max_age = (get_setting('webhook', 'snapshot_max_age_seconds', 600) if webhook_enabled
+                        else get_setting('daemon', 'snapshot_max_age_seconds', 60))
+    intervals = get_setting('daemon', 'intervals_seconds', {})
+    latest_reports = {}
+    reports_lock = threading.Lock()
+
+    def agent_job(job_name, report_name, send=False):
+        def job():
+            snapshot.refresh(snapshot_max_age)
+            report = system[job_name].execute()
+            with reports_lock:
+                latest_reports[report_name] = report
+                reports = dict(latest_reports)
+            print(f"\n[{report_name}]\n{report}")
+            if send:
+                send_reports(reports)
+        return job
+
+    def triage_job():
+        # Optionally recompute workloads right before every triage tick, so assignments see fresh numbers
+        if get_setting('workload_sync', 'enabled', True) and get_setting('workload_sync', 'every_triage_tick', False):
+            system["workload_sync"].sync()
+        agent_job("triage", 'Triage Agent')()
+
+    def refresh_sprint():
+        sprint_id = get_active_sprint_id(system["domain"], system["email"], system["token"], system["board_id"])
+        if sprint_id and sprint_id != snapshot.sprint_id:
+            print(f"  [Daemon] Active sprint changed: {snapshot.sprint_id} -> {sprint_id}")
+            snapshot.sprint_id = sprint_id
+            system["scrum_master"].sprint_id = sprint_id
+            snapshot.load()
+
+    scheduler.add_job("triage", triage_job, intervals.get("triage", 120))
+    scheduler.add_job("developer_assistant", agent_job("developer_assistant", 'Developer Assistant Agent'), intervals.get("developer_assistant", 900))
+    scheduler.add_job("qa_release", agent_job("qa_release", 'QA & Release Agent'), intervals.get("qa_release", 86400))
+    scheduler.add_job("scrum_master", agent_job("scrum_master", 'Scrum Master Agent', send=True), intervals.get("scrum_master", 3600))
+    if get_setting('workload_sync', 'enabled', True):
+        scheduler.add_job("workload_sync", system["workload_sync"].sync, intervals.get("workload_sync", 900))
+    scheduler.add_job("sprint_refresh", refresh_sprint, intervals.get("sprint_refresh", 21600), run_immediately=False)
+
+    # Optional push path: Jira webhooks wake the relevant agent within seconds
+    webhook_server = None
+    if webhook_enabled:
+        webhook_server = JiraWebhookServer(system["broker"]).start()
+        threading.Thread(target=dispatch_webhook_events, args=(system["broker"], scheduler, snapshot),
+                         name="webhook-dispatch", daemon=True).start()
+
+    scheduler.run_forever()
+    if webhook_server:
+        webhook_server.stop()
+
+    for name, stats in scheduler.get_stats().items():
+        print(f"  [Scheduler] {name}: {stats['runs']} runs, {stats['skipped']} skipped, {stats['failures']} failed")
+
+def shutdown(system):
+    """Prints pool/cache stats and closes every shared resource."""
+    # 6. Connection reuse stats for the shared Jira pool
+    jira_client = system["jira_client"]
+    for host, stats in jira_client.get_connection_stats().items():
+        print(f"  [Jira Pool] {host}: {stats['requests']} requests over {stats['connections']} connections ({stats['reused']} reused)")
+    write_stats = system["write_queue"].get_stats()
+    print(f"  [Jira Writes] {write_stats['operations']} mutations sent as {write_stats['requests']} requests ({write_stats['failed']} failed)")
+    jira_client.close()
+
+    for backend, stats in get_all_limiter_stats().items():
+        print(f"  [Rate Limit] {backend}: {stats['requests']} requests, {stats['throttled_seconds']:.1f}s throttled, "
+              f"{stats['rate_limited']} rate-limited, {stats['retries']} retries, {stats['failures']} failed "
+              f"(now {stats['requests_per_minute']}/min)")
+
+    llm_cache = get_shared_cache()
+    cache_stats = llm_cache.get_stats()
+    print(f"  [LLM Cache] {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)")
+    llm_cache.close()
+
+    system["broker"].close()
+    system["kb"].close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JIRA AutoPilot")
+    parser.add_argument("--daemon", action="store_true", help="Stay resident and run each agent on its own schedule.")
+    args = parser.parse_args()
+
+    print("\n========================================")
+    print("   ✈️   JIRA AUTOPILOT - SYSTEM START   ")
+    print("========================================\n")
+
+    # 1. Environment Setup
+    env_vars = ["JIRA_DOMAIN", "JIRA_EMAIL", "API_TOKEN", "BOARD_ID", "GEMINI_API_KEY"]
+    if not all(os.getenv(k) for k in env_vars):
+        print("❌ Error: Missing required environment variables. Check your .env file.")
+        exit()
+
+    JIRA_DOMAIN = os.getenv("JIRA_DOMAIN")
+    JIRA_EMAIL = os.getenv("JIRA_EMAIL")
+    API_TOKEN = os.getenv("API_TOKEN")
+    BOARD_ID = os.getenv("BOARD_ID")
+
+    SPRINT_ID = get_active_sprint_id(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN, BOARD_ID)
+    if not SPRINT_ID:
+        print("\n--- 🛑 JIRA AutoPilot run halted: No Active Sprint ---"); exit()
+
+    system = build_system(JIRA_DOMAIN, JIRA_EMAIL, API_TOKEN, BOARD_ID, SPRINT_ID)
+
+    if args.daemon:
+        run_daemon(system)
+    else:
+        run_once(system)
+
+    shutdown(system)
     print("\n========================================")
     print("   ✅   JIRA AUTOPILOT - RUN COMPLETE   ")
-    print("========================================")
\ No newline at end of file
+    print("========================================")
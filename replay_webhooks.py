@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+import argparse
+import requests
+
+# A local stand-in for Jira: POSTs recorded webhook payloads to the AutoPilot endpoint.
+# Usage:
+#   python replay_webhooks.py                                   (replays data/webhook_samples/)
+#   python replay_webhooks.py my_payloads.json --repeat 2       (repeat to exercise de-duplication)
+#   python replay_webhooks.py --url http://127.0.0.1:8765/webhook?secret=...
+
+DEFAULT_SOURCE = os.path.join("data", "webhook_samples")
+
+def load_payloads(source):
+    """Reads payloads from a .json file (object or list) or every .json file in a directory."""
+    paths = [source]
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source) if name.endswith(".json"))
+
+    payloads = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        payloads.extend(data if isinstance(data, list) else [data])
+    return payloads
+
+parser = argparse.ArgumentParser(description="Replay recorded Jira webhook payloads.")
+parser.add_argument("source", nargs="?", default=DEFAULT_SOURCE, help="Payload file or directory.")
+parser.add_argument("--url", default="http://127.0.0.1:8765/webhook", help="AutoPilot webhook endpoint.")
+parser.add_argument("--repeat", type=int, default=1, help="Send every payload this many times.")
+args = parser.parse_args()
+
+try:
+    payloads = load_payloads(args.source)
+except (OSError, json.JSONDecodeError) as e:
+    print(f"Could not load payloads from {args.source}: {e}")
+    sys.exit(1)
+
+print(f"\n--- Replaying {len(payloads)} payload(s) x{args.repeat} to {args.url} ---")
+session = requests.Session()
+for _ in range(args.repeat):
+    for payload in payloads:
+        key = (payload.get("issue") or {}).get("key", "?")
+        try:
+            response = session.post(args.url, json=payload, timeout=10)
+            print(f"  {payload.get('webhookEvent')} {key} -> {response.status_code} {response.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"  {payload.get('webhookEvent')} {key} -> failed: {e}")